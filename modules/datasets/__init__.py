@@ -1,5 +1,18 @@
 from .base_dataset import BaseDataset
+from .builder import COLLATE_FUNCTIONS, DATASETS, PIPELINES, SAMPLERS, build_dataloader, build_dataset, build_sampler
 from .mnist import MNIST, FashionMNIST
 from .cifar import CIFAR10, CIFAR100
+from .cub import CUB
+from .custom import CustomDataset
+from .packed import PackedDataset, pack_dataset
+from .dataset_wrappers import BatchedFetchDataset, ClassBalancedDataset, ConcatDataset, RepeatDataset
+from .collate import batch_collate
+from .fast_collate import FastCollate, SlotBatch
+from .sample_table import SampleTable, StringTable
+from .samplers import BlockShuffleSampler, ClassBalancedSampler, DistributedSampler, ShardedSampler
 
-__all__ = ['BaseDataset', 'MNIST', 'FashionMNIST', 'CIFAR10', 'CIFAR100']
+__all__ = ['BaseDataset', 'DATASETS', 'PIPELINES', 'SAMPLERS', 'COLLATE_FUNCTIONS', 'build_dataset', 'build_dataloader',
+           'build_sampler', 'MNIST', 'FashionMNIST', 'CIFAR10', 'CIFAR100', 'CUB', 'CustomDataset', 'PackedDataset',
+           'pack_dataset', 'ConcatDataset', 'RepeatDataset', 'ClassBalancedDataset', 'BatchedFetchDataset',
+           'SampleTable', 'StringTable', 'DistributedSampler', 'BlockShuffleSampler', 'ShardedSampler',
+           'ClassBalancedSampler', 'batch_collate', 'FastCollate', 'SlotBatch']
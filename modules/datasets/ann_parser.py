@@ -0,0 +1,154 @@
+import os
+import os.path as osp
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .sample_table import StringTable
+
+__all__ = ['parse_ann_bytes', 'parse_ann_file']
+
+# bytes stripped by ``str.strip``
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+_POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+
+def _region_indices(starts, ends):
+    """Indices of the bytes of the disjoint regions [starts[i], ends[i]) of a buffer.
+    Args:
+        starts (np.ndarray, required): Start of every region.
+        ends (np.ndarray, required): End of every region.
+    Return:
+        :np.ndarray: int64 indices of all the bytes of the regions, in order.
+    """
+    lengths = ends - starts
+    offsets = np.cumsum(lengths) - lengths
+
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum(), dtype=np.int64)
+
+
+def parse_ann_bytes(data):
+    """Parse annotation lines ``<path> <label>`` with vectorized numpy operations.
+    Every line is stripped and split at its last space like ``line.strip().rsplit(' ', 1)``, blank lines are
+    skipped. The paths are gathered into one byte buffer and the labels are converted in bulk.
+    Args:
+        data (bytes, required): Complete lines of an annotation file.
+    Return:
+        :tuple[np.ndarray, np.ndarray, np.ndarray]: int64 labels, uint8 buffer of the concatenated utf-8
+            paths and int64 length of every path.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+    line_ends = newlines if len(buf) and buf[-1] == 10 else np.append(newlines, len(buf))
+    line_starts = np.concatenate([[0], line_ends[:-1] + 1]).astype(np.int64)
+
+    # strip every line, moving the bounds one byte per iteration as leading and trailing whitespace is short
+    starts, ends = line_starts, line_ends.astype(np.int64)
+    while True:
+        move = starts < ends
+        move[move] = _WHITESPACE[buf[starts[move]]]
+        if not move.any():
+            break
+        starts = starts + move
+    while True:
+        move = starts < ends
+        move[move] = _WHITESPACE[buf[ends[move] - 1]]
+        if not move.any():
+            break
+        ends = ends - move
+    keep = starts < ends
+    starts, ends = starts[keep], ends[keep]
+
+    # split at the last space
+    spaces = np.flatnonzero(buf == 32)
+    split = np.searchsorted(spaces, ends) - 1
+    malformed = split < 0
+    split = spaces[np.maximum(split, 0)] if len(spaces) else np.full(len(starts), -1)
+    malformed |= split < starts
+    if malformed.any():
+        idx = int(np.argmax(malformed))
+        raise ValueError(f'Can not split the annotation line {data[starts[idx]:ends[idx]]!r} into path and label.')
+
+    label_starts, label_lengths = split + 1, ends - split - 1
+    digits = buf[_region_indices(label_starts, ends)].astype(np.int64) - 48
+    if len(digits) and (digits.min() < 0 or digits.max() > 9):
+        # signs or other rare formats, let python parse them
+        labels = np.array([int(data[s:e]) for s, e in zip(label_starts, ends)], dtype=np.int64)
+    elif len(digits):
+        # weight every digit by its power of ten and sum the digits of each label
+        label_offsets = np.cumsum(label_lengths) - label_lengths
+        power = np.repeat(label_offsets + label_lengths, label_lengths) - np.arange(len(digits)) - 1
+        labels = np.add.reduceat(digits * _POWERS_OF_TEN[power], label_offsets)
+    else:
+        labels = np.zeros(0, dtype=np.int64)
+
+    # the paths fill most of the buffer, so mask out the short gaps between them instead of indexing the paths
+    keep = np.ones(len(buf), dtype=bool)
+    gap_starts = np.concatenate([[0], split]).astype(np.int64)
+    gap_ends = np.concatenate([starts, [len(buf)]]).astype(np.int64)
+    keep[_region_indices(gap_starts, gap_ends)] = False
+
+    return labels.astype(np.int64), buf[keep], (split - starts).astype(np.int64)
+
+
+def _parse_ann_range(file_path, start, end, chunk_size):
+    """Parse the lines of a file starting inside the byte range [start, end).
+    Args:
+        file_path (str, required): Path of the annotation file.
+        start (int, required): First byte of the range.
+        end (int, required): End of the range.
+        chunk_size (int, required): Number of bytes read and parsed at once.
+    Return:
+        :tuple[np.ndarray, np.ndarray, np.ndarray]: Labels, path buffer and path lengths.
+    """
+    parts = []
+    with open(file_path, 'rb') as f:
+        if start > 0:
+            # the line crossing the start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while pos < end:
+            data = f.read(min(chunk_size, end - pos))
+            if not data.endswith(b'\n'):
+                data += f.readline()
+            pos += len(data)
+            parts.append(parse_ann_bytes(data))
+
+    if not parts:
+        return np.zeros(0, np.int64), np.zeros(0, np.uint8), np.zeros(0, np.int64)
+
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def parse_ann_file(file_path, byte_range=None, num_workers=8, chunk_size=64 * 1024 * 1024,
+                   parallel_threshold=256 * 1024 * 1024):
+    """Parse an annotation file into a string table of paths and an array of labels.
+    The file is streamed in chunks, so the peak memory stays close to the final arrays. Files larger than
+    ``parallel_threshold`` are split into byte ranges parsed by a process pool.
+    Args:
+        file_path (str, required): Path of a local annotation file, each line is ``<path> <label>``.
+        byte_range (tuple[int, int] | None, optional): Only parse the lines starting in this byte range.
+            Default to None, the whole file.
+        num_workers (int, optional): Number of parsing processes for large files. Default to 8.
+        chunk_size (int, optional): Number of bytes parsed at once. Default to 64MB.
+        parallel_threshold (int, optional): Size from which the file is parsed in parallel. Default to 256MB.
+    Return:
+        :tuple[StringTable, np.ndarray]: The paths and the int64 labels.
+    """
+    start, end = byte_range if byte_range is not None else (0, osp.getsize(file_path))
+    end = min(end, osp.getsize(file_path))
+
+    if num_workers > 1 and end - start > parallel_threshold:
+        bounds = np.linspace(start, end, min(num_workers, os.cpu_count() or 1) + 1).astype(np.int64)
+        with ProcessPoolExecutor(len(bounds) - 1) as executor:
+            parts = list(executor.map(
+                _parse_ann_range, [file_path] * (len(bounds) - 1), bounds[:-1].tolist(), bounds[1:].tolist(),
+                [chunk_size] * (len(bounds) - 1)))
+        labels, path_buffer, path_lengths = (np.concatenate(arrays) for arrays in zip(*parts))
+    else:
+        labels, path_buffer, path_lengths = _parse_ann_range(file_path, start, end, chunk_size)
+
+    offsets = np.zeros(len(path_lengths) + 1, dtype=np.int64)
+    np.cumsum(path_lengths, out=offsets[1:])
+
+    return StringTable(path_buffer, offsets), labels
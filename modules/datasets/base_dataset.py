@@ -1,12 +1,19 @@
-import copy
 import os.path as osp
 import mmcv
 import numpy as np
+import torch.distributed as dist
 from torch.utils.data import Dataset
 from abc import ABCMeta, abstractmethod
+from functools import partial
 from os import PathLike
 from typing import List
-from .pipelines import Compose
+from mmcv import FileClient
+from mmcv.runner import get_dist_info
+from mmcv.utils import build_from_cfg
+from .builder import PIPELINES
+from .bytes_cache import SharedBytesCache
+from .pipelines import Compose, Results
+from .sample_table import SampleTable
 
 
 def expanduser(path):
@@ -28,8 +35,9 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
     """Base dataset.
     Args:
         data_path_prefix (str, required): The prefix of data path.
-        pipeline (list, required): A list of dict, where each element represents
-            a operation defined in `datasets.pipelines`.
+        pipeline (list | dict, required): A list of dict, where each element represents
+            a operation defined in `datasets.pipelines`, or the config dict of a whole
+            :class:`Compose`, e.g. to enable its profiling.
         classes (Sequence[str] | str | None): If classes is None, use
             default CLASSES defined by builtin dataset. If classes is a
             string, take it as a file name. The file contains the name of
@@ -42,6 +50,12 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
     """
 
     CLASSES = None
+    # whether ``__getitems__`` may return stacked batches, which need :func:`batch_collate`
+    batched_fetch = False
+    # whether every rank only loads its own part of the samples, set by subclasses before ``__init__``
+    shard_by_rank = False
+    # shared cache of the encoded files, see :meth:`build_bytes_cache`
+    bytes_cache = None
 
     def __init__(self,
                  data_path_prefix,
@@ -52,14 +66,35 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
         super(BaseDataset, self).__init__()
         # initialize intra-class variables
         self.data_path_prefix = data_path_prefix
-        self.pipeline = Compose(pipeline)
+        self.pipeline = build_from_cfg(pipeline, PIPELINES) if isinstance(pipeline, dict) else Compose(pipeline)
         self.CLASSES = self.get_classes(classes)
         self.ann_file = expanduser(ann_file)
         self.test_mode = test_mode
         self.data_infos = self.load_annotations()
+        if not isinstance(self.data_infos, SampleTable):
+            # keep supporting subclasses which still return a list of dicts
+            self.data_infos = SampleTable.from_infos(self.data_infos)
+
+        # the caches of a node are keyed by the index among the samples of all ranks
+        self.shard_sizes = None
+        self.key_offset = 0
+        if self.shard_by_rank:
+            rank, world_size = get_dist_info()
+            self.shard_sizes = [len(self)]
+            if world_size > 1:
+                self.shard_sizes = [None] * world_size
+                dist.all_gather_object(self.shard_sizes, len(self))
+            self.key_offset = sum(self.shard_sizes[:rank])
+        if isinstance(self.pipeline, Compose):
+            self.pipeline.build_cache(self.num_keys, key=f'prefix:{self.cache_identity}')
 
     @abstractmethod
     def load_annotations(self):
+        """Load the samples of the dataset.
+
+        Return:
+            :SampleTable: Columnar table of the samples.
+        """
         pass
 
     @property
@@ -76,12 +111,10 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
         """Get all ground-truth labels (categories).
 
         Return:
-            :np.ndarray: categories for all images.
+            :np.ndarray: categories for all images, a read-only view of the label column.
         """
 
-        gt_labels = np.array([data['gt_label'] for data in self.data_infos])
-
-        return gt_labels
+        return self.data_infos.gt_labels
 
     def get_category_ids(self, idx):
         """Get category id by index.
@@ -91,7 +124,69 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
             :list[int]: Image category of specified index.
         """
 
-        return [int(self.data_infos[idx]['gt_label'])]
+        return [int(self.data_infos.gt_labels[idx])]
+
+    def get_data_info(self, idx):
+        """Get the information dict of one sample before the pipeline.
+        Args:
+            idx (int, required): Index of data.
+        Return:
+            :dict: Information of the sample, built from the sample table, with the encoded image as
+                ``img_bytes`` when the bytes cache is enabled.
+        """
+        info = self.data_infos[idx]
+        if self.bytes_cache is not None:
+            info['img_bytes'] = self.read_cached_bytes(idx, info)
+
+        return info
+
+    @property
+    def num_keys(self):
+        """Number of samples of all ranks, the keys of the caches of a node.
+
+        Return:
+            :int: The sum of ``shard_sizes`` when sharded by rank, else the length of the dataset.
+        """
+        return len(self) if self.shard_sizes is None else sum(self.shard_sizes)
+
+    @property
+    def cache_identity(self):
+        """Identity of the samples in the caches of a node.
+
+        Return:
+            :str: Dataset type, path, annotation file and split.
+        """
+        return f'{type(self).__name__}:{osp.abspath(self.data_path_prefix)}:{self.ann_file}:{self.test_mode}'
+
+    def build_bytes_cache(self, cfg):
+        """Enable the cache of encoded files shared by all processes of the node, see
+        :class:`SharedBytesCache`. It must be called by all ranks.
+        Args:
+            cfg (dict, required): Arguments of the cache, e.g. ``dict(max_bytes=32 << 30)``.
+        """
+        self.bytes_cache = SharedBytesCache(self.num_keys, key=f'bytes:{self.cache_identity}', **cfg)
+        self.file_client = None
+
+    def read_cached_bytes(self, idx, info):
+        """Read the encoded image of a sample through the bytes cache, filling it on a miss.
+        Args:
+            idx (int, required): Index of data.
+            info (dict, required): Information of the sample, with ``img_prefix`` and ``img_info``.
+        Return:
+            :bytes: The content of the image file.
+        """
+        key = self.key_offset + idx
+        img_bytes = self.bytes_cache.get(key)
+        if img_bytes is None:
+            filename = info['img_info']['filename']
+            if info.get('img_prefix') is not None:
+                filename = osp.join(info['img_prefix'], filename)
+            if self.file_client is None:
+                self.file_client = FileClient.infer_client(getattr(self, 'file_client_args', None), filename)
+            img_bytes = self.file_client.get(filename)
+            self.bytes_cache.put(key, img_bytes)
+
+        return img_bytes
 
     def prepare_data(self, idx):
         """Use transform for data pre-processing.
@@ -100,9 +195,37 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
         Return:
             :callable: The data with pipeline.
         """
-        results = copy.deepcopy(self.data_infos[idx])
+        if not isinstance(self.pipeline, Compose):
+            return self.pipeline(self._load_sample(idx))
 
-        return self.pipeline(results)
+        # the index keys the cached output of the deterministic prefix of the pipeline, if enabled,
+        # and the sample, e.g. its file, is only read on a miss
+        return self.pipeline(partial(self._load_sample, idx), cache_key=self.key_offset + idx)
+
+    def _load_sample(self, idx):
+        # the sample is shared with the table instead of deep copied, arrays of the
+        # table are read-only and transforms copy a field only when they modify it
+        return Results(self.get_data_info(idx))
+
+    def prepare_batch(self, indices):
+        """Prepare several samples at once.
+        In-memory datasets whose pipeline supports the batch mode fancy-index the stacked images and run
+        the transforms once on the whole N x H x W x C block. Other datasets fall back to ``prepare_data``.
+        Args:
+            indices (Sequence[int], required): Indices of data.
+        Return:
+            :dict | list: Stacked batch of the fast path, or list of samples of the fallback.
+        """
+        if self.data_infos.imgs is None or not self.pipeline.supports_batch:
+            return [self.prepare_data(idx) for idx in indices]
+
+        indices = np.asarray(indices, dtype=np.int64)
+        results = Results()
+        # fancy indexing returns new arrays, which belong to the batch
+        results['img'] = self.data_infos.imgs[indices]
+        results['gt_label'] = self.data_infos.gt_labels[indices]
+
+        return self.pipeline.batch(results)
 
     def __len__(self):
         """Get the length of dataset.
@@ -123,6 +246,20 @@ class BaseDataset(Dataset, metaclass=ABCMeta):
 
         return self.prepare_data(idx)
 
+    def __getitems__(self, indices):
+        """Index a batch of data, used by the auto-batching of ``DataLoader``.
+        The stacked batches of the fast path are only returned when ``batched_fetch`` is set, otherwise a list
+        of samples is returned, which the default collate function of ``DataLoader`` accepts.
+        Args:
+            indices (list[int], required): Indices of data.
+        Return:
+            :dict | list: Batch to be collated by :func:`batch_collate`.
+        """
+        if not self.batched_fetch:
+            return [self.prepare_data(idx) for idx in indices]
+
+        return self.prepare_batch(indices)
+
     # classmethod 无需实例化类即可调用该函数
     @classmethod
     def get_classes(cls, classes=None):
@@ -1,13 +1,13 @@
 import copy
 import platform
-import random
-import numpy as np
+import time
 import torch
 from functools import partial
-from mmcv.parallel import collate
 from mmcv.runner import get_dist_info
 from mmcv.utils import Registry, build_from_cfg, digit_version
 from torch.utils.data import DataLoader
+from .collate import batch_collate
+from ..utlis import get_root_logger, set_random_seed
 
 # resource constraints to avoid multi-process problems
 if platform.system() != 'Windows':
@@ -19,7 +19,229 @@ if platform.system() != 'Windows':
     soft_limit = min(4096, hard_limit)
     resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
 
-# Create a register of dataset、pipeline and sampler
+# Create a register of dataset、pipeline、sampler and collate function
 DATASETS = Registry('dataset')
 PIPELINES = Registry('pipeline')
 SAMPLERS = Registry('sampler')
+COLLATE_FUNCTIONS = Registry('collate function')
+
+
+def build_dataset(cfg, default_args=None):
+    """Build a dataset from its config.
+    Args:
+        cfg (dict | list[dict], required): Config of the dataset, with the registered ``type``. A list of
+            configs is concatenated, and the configs of the wrappers hold the config of their datasets.
+        default_args (dict | None, optional): Default arguments of the dataset. Default to None.
+    Return:
+        :Dataset: The built dataset.
+    """
+    from .dataset_wrappers import ClassBalancedDataset, ConcatDataset, RepeatDataset
+    if isinstance(cfg, (list, tuple)):
+        dataset = ConcatDataset([build_dataset(c, default_args) for c in cfg])
+    elif cfg['type'] == 'ConcatDataset':
+        dataset = ConcatDataset([build_dataset(c, default_args) for c in cfg['datasets']])
+    elif cfg['type'] == 'RepeatDataset':
+        dataset = RepeatDataset(build_dataset(cfg['dataset'], default_args), cfg['times'])
+    elif cfg['type'] == 'ClassBalancedDataset':
+        dataset = ClassBalancedDataset(build_dataset(cfg['dataset'], default_args), cfg['oversample_thr'])
+    else:
+        dataset = build_from_cfg(cfg, DATASETS, default_args)
+
+    return dataset
+
+
+def build_sampler(cfg, default_args=None):
+    """Build a sampler from its config.
+    Args:
+        cfg (dict | None, required): Config of the sampler, with the registered ``type``.
+        default_args (dict | None, optional): Default arguments of the sampler. Default to None.
+    Return:
+        :Sampler | None: The built sampler, None if ``cfg`` is None.
+    """
+    if cfg is None:
+        return None
+
+    return build_from_cfg(cfg, SAMPLERS, default_args=default_args)
+
+
+def build_dataloader(dataset,
+                     samples_per_gpu,
+                     workers_per_gpu,
+                     num_gpus=1,
+                     dist=True,
+                     shuffle=True,
+                     round_up=True,
+                     seed=None,
+                     pin_memory=True,
+                     persistent_workers=True,
+                     prefetch_factor=2,
+                     sampler_cfg=None,
+                     collate_cfg=None,
+                     **kwargs):
+    """Build PyTorch DataLoader.
+    In distributed training, each GPU/process has a dataloader. In non-distributed training, there is only
+    one dataloader for all GPUs. Batches are collated by :func:`batch_collate`, so the datasets derived
+    from ``BaseDataset`` are loaded through a :class:`BatchedFetchDataset` view using their batched fetch
+    path. The dataset itself is not modified.
+    Args:
+        dataset (Dataset, required): A PyTorch dataset.
+        samples_per_gpu (int, required): Number of training samples on each GPU, i.e., batch size of each GPU.
+        workers_per_gpu (int, required): How many subprocesses to use for data loading for each GPU.
+        num_gpus (int, optional): Number of GPUs. Only used in non-distributed training. Default to 1.
+        dist (bool, optional): Distributed training/test or not. Default to True.
+        shuffle (bool, optional): Whether to shuffle the data at every epoch. Default to True.
+        round_up (bool, optional): Whether to round up the length of dataset by adding extra samples to make
+            it evenly divisible. Default to True.
+        seed (int | None, optional): Seed of the sampler and of the workers. Default to None.
+        pin_memory (bool, optional): Whether to use pin_memory in DataLoader. Collate functions with a
+            ``pin_memory`` attribute, e.g. :class:`FastCollate`, pin their own buffers instead. Default to True.
+        persistent_workers (bool, optional): Whether the workers are kept alive between epochs, which saves
+            their start-up and the reloading of the dataset. Only used with workers. Default to True.
+        prefetch_factor (int, optional): Number of batches loaded in advance by each worker. Only used with
+            workers. Default to 2.
+        sampler_cfg (dict | None, optional): Config of a sampler registered in ``SAMPLERS``. Datasets sharded by
+            rank, which have ``shard_sizes``, need a sampler declaring ``sharded = True``. Default to None,
+            ``ShardedSampler`` for a sharded dataset and ``DistributedSampler`` otherwise in distributed mode,
+            the sampler of ``DataLoader`` in non-distributed mode.
+        collate_cfg (dict | None, optional): Config of a collate function registered in ``COLLATE_FUNCTIONS``,
+            e.g. ``dict(type='FastCollate')``. Default to None, :func:`batch_collate`.
+        kwargs (dict, optional): Any keyword argument to be used to initialize DataLoader.
+    Return:
+        :DataLoader: A PyTorch dataloader.
+    """
+    rank, world_size = get_dist_info()
+    # a sampler of the whole dataset would subsample the local part of a sharded one again
+    sharded = getattr(dataset, 'shard_sizes', None) is not None
+
+    if sampler_cfg is not None:
+        sampler_type = sampler_cfg['type']
+        sampler_cls = SAMPLERS.get(sampler_type) if isinstance(sampler_type, str) else sampler_type
+        if sharded and not getattr(sampler_cls, 'sharded', False):
+            raise ValueError(f'{type(dataset).__name__} is sharded by rank, but the sampler {sampler_type} '
+                             'samples a whole dataset, use ShardedSampler.')
+        sampler_cfg = copy.deepcopy(sampler_cfg)
+        sampler_cfg.setdefault('shuffle', shuffle)
+        sampler = build_sampler(
+            sampler_cfg,
+            default_args=dict(dataset=dataset, num_replicas=world_size if dist else 1, rank=rank if dist else 0,
+                              seed=seed))
+    elif dist and sharded:
+        sampler = build_sampler(
+            dict(type='ShardedSampler', dataset=dataset, num_replicas=world_size, rank=rank, shuffle=shuffle,
+                 seed=seed))
+    elif dist:
+        sampler = build_sampler(
+            dict(type='DistributedSampler', dataset=dataset, num_replicas=world_size, rank=rank, shuffle=shuffle,
+                 round_up=round_up, seed=seed))
+    else:
+        sampler = None
+    # the sampler decides the order when there is one
+    if sampler is not None:
+        shuffle = False
+
+    if dist:
+        batch_size = samples_per_gpu
+        num_workers = workers_per_gpu
+    else:
+        batch_size = num_gpus * samples_per_gpu
+        num_workers = num_gpus * workers_per_gpu
+
+    init_fn = partial(worker_init_fn, num_workers=num_workers, rank=rank, seed=seed) if seed is not None else None
+
+    if num_workers > 0:
+        if digit_version(torch.__version__) >= digit_version('1.8.0'):
+            kwargs['persistent_workers'] = persistent_workers
+        kwargs['prefetch_factor'] = prefetch_factor
+
+    if collate_cfg is not None:
+        collate_fn = build_from_cfg(
+            collate_cfg, COLLATE_FUNCTIONS,
+            default_args=dict(batch_size=batch_size, prefetch_factor=prefetch_factor, samples_per_gpu=samples_per_gpu))
+    else:
+        collate_fn = partial(batch_collate, samples_per_gpu=samples_per_gpu)
+    if hasattr(collate_fn, 'pin_memory'):
+        # the collate function pins its own buffers, the pinning thread would copy every batch
+        collate_fn.pin_memory = pin_memory
+        pin_memory = False
+
+    loaded_dataset = dataset
+    if hasattr(dataset, 'prepare_batch'):
+        from .dataset_wrappers import BatchedFetchDataset
+        # the collate functions accept the stacked batches of the fast path
+        loaded_dataset = BatchedFetchDataset(dataset)
+
+    data_loader = DataLoader(
+        loaded_dataset,
+        batch_size=batch_size,
+        sampler=sampler,
+        num_workers=num_workers,
+        collate_fn=collate_fn,
+        pin_memory=pin_memory,
+        shuffle=shuffle,
+        worker_init_fn=init_fn,
+        **kwargs)
+
+    return data_loader
+
+
+def worker_init_fn(worker_id, num_workers, rank, seed):
+    """Seed every worker deterministically from the global seed, its rank and its id.
+    Args:
+        worker_id (int, required): Id of the worker.
+        num_workers (int, required): Number of workers of each rank.
+        rank (int, required): Rank of the process.
+        seed (int, required): The global seed.
+    """
+    worker_seed = num_workers * rank + worker_id + seed
+    set_random_seed(worker_seed)
+
+
+def measure_throughput(data_loader, num_batches=50, warmup=5):
+    """Measure the number of samples per second produced by a dataloader.
+    The first ``warmup`` batches, which include the start of the workers and the cold caches, are not
+    timed.
+    Args:
+        data_loader (DataLoader, required): The dataloader to be measured.
+        num_batches (int, optional): Number of timed batches. Default to 50.
+        warmup (int, optional): Number of batches loaded before the timing starts. Default to 5.
+    Return:
+        :float: Samples per second of the timed batches.
+    """
+    num_samples, tic = 0, None
+    for i, _ in enumerate(data_loader):
+        if i == warmup:
+            tic = time.perf_counter()
+        elif i > warmup:
+            num_samples += data_loader.batch_size
+        if i == warmup + num_batches:
+            break
+    if tic is None or num_samples == 0:
+        return 0.
+
+    return num_samples / (time.perf_counter() - tic)
+
+
+def tune_num_workers(dataset, samples_per_gpu, candidates=(0, 2, 4, 8), num_batches=50, warmup=5, **kwargs):
+    """Pick the number of workers per GPU from measured throughputs instead of guessing it.
+    Args:
+        dataset (Dataset, required): The dataset to be loaded.
+        samples_per_gpu (int, required): Batch size of each GPU.
+        candidates (Sequence[int], optional): Numbers of workers to be measured. Default to (0, 2, 4, 8).
+        num_batches (int, optional): Number of timed batches of every candidate. Default to 50.
+        warmup (int, optional): Number of untimed batches of every candidate. Default to 5.
+        kwargs (dict, optional): Other arguments of :func:`build_dataloader`.
+    Return:
+        :tuple[int, dict[int, float]]: The fastest number of workers and the samples per second of every
+            candidate.
+    """
+    logger = get_root_logger()
+    kwargs['persistent_workers'] = False
+    throughputs = {}
+    for num_workers in candidates:
+        data_loader = build_dataloader(dataset, samples_per_gpu, num_workers, **kwargs)
+        throughputs[num_workers] = measure_throughput(data_loader, num_batches=num_batches, warmup=warmup)
+        logger.info(f'workers_per_gpu={num_workers}: {throughputs[num_workers]:.1f} samples/sec')
+    best = max(throughputs, key=throughputs.get)
+    logger.info(f'fastest workers_per_gpu: {best}')
+
+    return best, throughputs
@@ -0,0 +1,203 @@
+import atexit
+import fcntl
+import os
+import os.path as osp
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import torch.distributed as dist
+from mmcv.runner import get_dist_info
+from torch.utils.data import get_worker_info
+from .shared_memory import attach_shared_array, create_shared_zeros, get_local_dist_info, node_segment_prefix
+
+__all__ = ['SharedBytesCache']
+
+# entries of the state array, followed by the counters of every process
+HEAD, NUM_STATES = 0, 1
+HITS, MISSES, INSERTS = 0, 1, 2
+NUM_COUNTERS = 3
+
+
+class SharedBytesCache(object):
+    """Cache of encoded files in shared memory, shared by all ranks and DataLoader workers of a node.
+    The bytes are appended to a ring buffer of ``max_bytes`` in POSIX shared memory, the oldest entries
+    being evicted when the ring comes back over them. A table in shared memory records where the bytes of
+    every key are. The cache is filled lazily: the first process missing a key reads the file and puts it.
+
+    Only reserving space in the ring takes a lock, a ``flock`` on a file which works across processes of
+    unrelated launchers. Reads are lock-free: the bytes are copied out of the ring, then the entry is
+    checked to be unchanged and not yet overwritten, else the read counts as a miss.
+
+    Every process counts its hits, misses and inserts in its own row of a shared table, :meth:`counters`
+    sums them over the node. The row of a process is given by its local rank and DataLoader worker id, so
+    the workers started at every epoch reuse the rows of the previous ones. Workers beyond ``max_workers``
+    share a last row, which they update under the lock. The ring lives in ``/dev/shm``, which must be large
+    enough for ``max_bytes``. It must be created by all ranks, e.g. when the dataset is built.
+
+    Eviction is first in first out by default. With ``lru``, an entry hit in the oldest quarter of the ring
+    is written again at its head, which approximates least recently used eviction.
+    Args:
+        num_keys (int, required): Number of keys, which are integers in ``[0, num_keys)``.
+        max_bytes (int, optional): Size of the ring buffer in bytes. Default to 1GB.
+        key (str, optional): Identity of the cached data, e.g. dataset type, path and split.
+            Default to 'bytes'.
+        max_workers (int, optional): Number of DataLoader workers of every rank with their own row of counters.
+            Default to 64.
+        lru (bool, optional): Whether to move the entries hit before their eviction to the head of the ring.
+            Default to False.
+    """
+
+    def __init__(self, num_keys, max_bytes=1 << 30, key='bytes', max_workers=64, lru=False):
+        self.num_keys = num_keys
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.lru = lru
+
+        _, world_size = get_dist_info()
+        # kept for the workers, which do not see the process group of their rank
+        local_rank, local_world_size = get_local_dist_info()
+        self.local_rank = local_rank
+        # the main process and the workers of every rank, then the row shared by the other workers
+        self.num_rows = local_world_size * (max_workers + 1) + 1
+        prefix = node_segment_prefix(f'{key}:{num_keys}:{max_bytes}')
+        # unique to the cache and the run, also names the files of the users of the cache
+        self.prefix = prefix
+        self.lock_file = osp.join(tempfile.gettempdir(), f'{prefix}.lock')
+        shapes = {
+            'slots': ((num_keys, 2), np.int64),
+            'states': ((NUM_STATES + self.num_rows * NUM_COUNTERS, ), np.int64),
+            'ring': ((max_bytes, ), np.uint8)
+        }
+        if local_rank == 0:
+            arrays = {name: create_shared_zeros(f'{prefix}_{name}', *shape) for name, shape in shapes.items()}
+            # start -1 marks an empty slot
+            arrays['slots'][:, 0] = -1
+            open(self.lock_file, 'a').close()
+            atexit.register(self._remove_lock_file, os.getpid())
+        if world_size > 1:
+            dist.barrier()
+        if local_rank != 0:
+            arrays = {
+                name: attach_shared_array(f'{prefix}_{name}', *shape, writeable=True)
+                for name, shape in shapes.items()
+            }
+
+        self.slots = arrays['slots']
+        self.states = arrays['states']
+        self.ring = arrays['ring']
+        self._pid = None
+
+    def _remove_lock_file(self, creator):
+        # forked DataLoader workers inherit the handler but must not remove the file
+        if os.getpid() == creator and osp.exists(self.lock_file):
+            os.remove(self.lock_file)
+
+    def __getstate__(self):
+        # the shared arrays are sent by name, the lock and the row of counters belong to each process
+        state = self.__dict__.copy()
+        state['_pid'] = None
+        for name in ['_lock_fd', '_slots', '_states', '_ring', '_counters', '_shared_row']:
+            state.pop(name, None)
+
+        return state
+
+    def _attach(self):
+        """Open the lock and find the row of counters, once per process."""
+        self._pid = os.getpid()
+        # plain views, slicing the shared arrays themselves runs their python hooks
+        self._slots = self.slots.view(np.ndarray)
+        self._states = self.states.view(np.ndarray)
+        self._ring = self.ring.view(np.ndarray)
+        # a descriptor inherited through fork would share its flock with the parent
+        self._lock_fd = os.open(self.lock_file, os.O_RDWR)
+        worker_info = get_worker_info()
+        worker = 0 if worker_info is None else worker_info.id + 1
+        self._shared_row = worker > self.max_workers
+        row = self.num_rows - 1 if self._shared_row else self.local_rank * (self.max_workers + 1) + worker
+        start = NUM_STATES + row * NUM_COUNTERS
+        self._counters = self._states[start:start + NUM_COUNTERS]
+
+    def _count(self, counter):
+        if self._shared_row:
+            with self._locked():
+                self._counters[counter] += 1
+        else:
+            self._counters[counter] += 1
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """Get the bytes of a key.
+        Args:
+            key (int, required): The key.
+        Return:
+            :bytes | None: The cached bytes, None on a miss.
+        """
+        if self._pid != os.getpid():
+            self._attach()
+        start = int(self._slots[key, 0])
+        if start >= 0:
+            length = int(self._slots[key, 1])
+            offset = start % self.max_bytes
+            data = self._ring[offset:offset + length].tobytes()
+            # the entry was not replaced meanwhile and the ring did not come back over it
+            head = int(self._states[HEAD])
+            if int(self._slots[key, 0]) == start and start >= head - self.max_bytes:
+                self._count(HITS)
+                if self.lru and start < head - self.max_bytes * 3 // 4:
+                    self.put(key, data)
+                return data
+
+        self._count(MISSES)
+        return None
+
+    def put(self, key, data):
+        """Put the bytes of a key, evicting the oldest entries of the ring.
+        Args:
+            key (int, required): The key.
+            data (bytes, required): The bytes.
+        Return:
+            :bool: Whether the bytes are cached, False if larger than the ring.
+        """
+        if self._pid != os.getpid():
+            self._attach()
+        length = len(data)
+        if length > self.max_bytes:
+            return False
+
+        with self._locked():
+            # positions only grow, an entry never wraps around the end of the ring
+            start = int(self._states[HEAD])
+            if start % self.max_bytes + length > self.max_bytes:
+                start = (start // self.max_bytes + 1) * self.max_bytes
+            self._states[HEAD] = start + length
+        offset = start % self.max_bytes
+        self._ring[offset:offset + length] = np.frombuffer(data, dtype=np.uint8)
+        # the start is cleared first and published last, so a reader never pairs it with another length
+        self._slots[key, 0] = -1
+        self._slots[key, 1] = length
+        self._slots[key, 0] = start
+        self._count(INSERTS)
+
+        return True
+
+    def counters(self):
+        """Sum the counters of all processes of the node.
+
+        Return:
+            :dict: Number of hits, misses and inserts, and the number of bytes written to the ring.
+        """
+        counters = np.asarray(self.states[NUM_STATES:]).reshape(self.num_rows, NUM_COUNTERS).sum(axis=0)
+
+        return {
+            'hits': int(counters[HITS]),
+            'misses': int(counters[MISSES]),
+            'inserts': int(counters[INSERTS]),
+            'written_bytes': int(self.states[HEAD])
+        }
@@ -1,11 +1,15 @@
 import os.path as osp
 import pickle
+import tarfile
 import numpy as np
 import torch.distributed as dist
 from mmcv.runner import get_dist_info
 from .base_dataset import BaseDataset
 from .builder import DATASETS
-from .utils import check_integrity, download_and_extract_archive
+from .index_cache import dump_arrays, file_fingerprint, load_arrays
+from .sample_table import SampleTable
+from .shared_memory import share_arrays_on_node
+from .utils import check_integrity, check_integrity_many, download_and_extract_archive, download_url
 
 
 @DATASETS.register_module()
@@ -13,6 +17,14 @@ class CIFAR10(BaseDataset):
     """`CIFAR10 <https://www.cs.toronto.edu/~kriz/cifar.html>`_ Dataset.
     This implementation is modified from
     https://github.com/pytorch/vision/blob/master/torchvision/datasets/cifar.py
+    Args:
+        verify (str, optional): How to verify the batch files. 'full' hashes them at every construction,
+            'fast' only hashes files changed since their last verification, 'none' only checks they exist.
+            Default to 'fast'.
+        shared_memory (bool, optional): Whether one process per node loads the split into POSIX shared
+            memory, which all ranks and DataLoader workers of the node attach to. Default to False.
+        from_archive (bool, optional): Whether to stream the batches straight out of the downloaded tar.gz
+            into the array cache next to it instead of extracting the archive. Default to False.
     """
     base_folder = 'cifar-10-batches-py'
     url = 'https://www.cs.toronto.edu/~kriz/cifar-10-python.tar.gz'
@@ -41,17 +53,31 @@ class CIFAR10(BaseDataset):
 
     imgs, gt_labels = [], []
 
+    def __init__(self, *args, verify='fast', shared_memory=False, from_archive=False, **kwargs):
+        self.verify = verify
+        self.shared_memory = shared_memory
+        self.from_archive = from_archive
+        super(CIFAR10, self).__init__(*args, **kwargs)
+
     def load_annotations(self):
         # get process number and total number of processes
         rank, work_size = get_dist_info()
 
-        if rank == 0 and not self._check_integrity():
-            download_and_extract_archive(
-                self.url,
-                self.data_path_prefix,
-                filename=self.filename,
-                md5=self.tgz_md5
-            )
+        if rank == 0:
+            if not self._check_integrity():
+                if self.from_archive:
+                    download_url(self.url, self.data_path_prefix, filename=self.filename, md5=self.tgz_md5,
+                                 verify=self.verify)
+                else:
+                    download_and_extract_archive(
+                        self.url,
+                        self.data_path_prefix,
+                        filename=self.filename,
+                        md5=self.tgz_md5,
+                        verify=self.verify
+                    )
+            # convert once before the other ranks read the cache
+            self._load_arrays()
 
         if work_size > 1:
             dist.barrier()
@@ -59,42 +85,113 @@ class CIFAR10(BaseDataset):
                 'Shared storage seems unavailable. ' \
                 f'Please download the dataset manually through {self.url}.'
 
+        if not self.shared_memory:
+            self.imgs, self.gt_labels = self._load_arrays()
+        else:
+            def load_split():
+                imgs, gt_labels = self._load_arrays()
+                return {'imgs': imgs, 'gt_labels': gt_labels}, {'classes': list(self.CLASSES)}
+
+            split = 'test' if self.test_mode else 'train'
+            key = f'{type(self).__name__}:{osp.abspath(self.data_path_prefix)}:{split}'
+            arrays, meta = share_arrays_on_node(key, load_split)
+            self.imgs, self.gt_labels, self.CLASSES = arrays['imgs'], arrays['gt_labels'], meta['classes']
+
+        return SampleTable(self.gt_labels, imgs=self.imgs)
+
+    def _load_arrays(self):
+        """Load images and labels of the split from the compact cache, building the cache on first use.
+        The cache holds a contiguous N x 32 x 32 x 3 uint8 array, the labels and the class names in one file
+        which is memory-mapped, so later starts neither unpickle, stack nor transpose anything. In archive
+        mode the cache is stored next to the archive and fingerprints it instead of the batch files.
+
+        Return:
+            :tuple[np.ndarray, np.ndarray]: The HWC images and the int64 labels.
+        """
         if not self.test_mode:
             downloaded_list = self.train_list
         else:
             downloaded_list = self.test_list
+        split = 'test' if self.test_mode else 'train'
+        file_names = [file_name for file_name, _ in downloaded_list]
+        folder = osp.join(self.data_path_prefix, self.base_folder)
+        if self.from_archive:
+            cache_path = osp.join(self.data_path_prefix, f'qcls_{self.base_folder}_{split}.idx')
+            fingerprint = [file_fingerprint(osp.join(self.data_path_prefix, self.filename))]
+        else:
+            cache_path = osp.join(folder, f'qcls_{split}.idx')
+            fingerprint = [
+                file_fingerprint(osp.join(folder, file_name)) for file_name in file_names + [self.meta['filename']]
+            ]
 
-        self.imgs, self.gt_labels = [], []
-        # load the picked numpy arrays
-        for file_name, check_md5 in downloaded_list:
-            file_path = osp.join(self.data_path_prefix, self.base_folder, file_name)
-            with open(file_path, 'rb') as f:
-                entry = pickle.load(f, encoding='latin1')
-                self.imgs.append(entry['data'])
-                if 'labels' in entry:
-                    self.gt_labels.extend(entry['labels'])
-                else:
-                    self.gt_labels.extend(entry['fine_labels'])
+        try:
+            arrays, meta = load_arrays(cache_path)
+            if meta['fingerprint'] == fingerprint:
+                self.CLASSES = meta['classes']
+                return arrays['imgs'], arrays['gt_labels']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self.from_archive:
+            entries = self._read_archive(file_names + [self.meta['filename']])
+            self.CLASSES = entries[self.meta['filename']][self.meta['key']]
+        else:
+            entries = {}
+            # load the picked numpy arrays
+            for file_name in file_names:
+                with open(osp.join(folder, file_name), 'rb') as f:
+                    entries[file_name] = pickle.load(f, encoding='latin1')
+            # load meta data
+            self._load_meta()
+
+        imgs, gt_labels = [], []
+        for file_name in file_names:
+            entry = entries[file_name]
+            imgs.append(entry['data'])
+            if 'labels' in entry:
+                gt_labels.extend(entry['labels'])
+            else:
+                gt_labels.extend(entry['fine_labels'])
 
-        self.imgs = np.vstack(self.imgs).reshape(-1, 3, 32, 32)
-        # convert to HWC
-        self.imgs = self.imgs.transpose((0, 2, 3, 1))
-        # load meta data
-        self._load_meta()
+        imgs = np.vstack(imgs).reshape(-1, 3, 32, 32)
+        # convert to contiguous HWC
+        imgs = np.ascontiguousarray(imgs.transpose((0, 2, 3, 1)))
+        gt_labels = np.array(gt_labels, dtype=np.int64)
 
-        data_infos = []
-        for img, gt_label in zip(self.imgs, self.gt_labels):
-            gt_label = np.array(gt_label, dtype=np.int64)
-            info = {'img': img, 'gt_label': gt_label}
-            data_infos.append(info)
+        try:
+            dump_arrays(cache_path, {'imgs': imgs, 'gt_labels': gt_labels},
+                        meta={'fingerprint': fingerprint, 'classes': list(self.CLASSES)})
+        except OSError:
+            # read-only dataset folder, convert again next time
+            pass
+
+        return imgs, gt_labels
+
+    def _read_archive(self, file_names):
+        """Unpickle members of the downloaded archive in one streaming pass, without extracting them.
+        Args:
+            file_names (list[str], required): Names of the members inside ``base_folder``.
+        Return:
+            :dict: The unpickled members by name.
+        """
+        entries = {}
+        wanted = {f'{self.base_folder}/{file_name}': file_name for file_name in file_names}
+        # 'r|gz' decompresses sequentially and never seeks back into the archive
+        with tarfile.open(osp.join(self.data_path_prefix, self.filename), 'r|gz') as tar:
+            for member in tar:
+                if member.isfile() and member.name in wanted:
+                    entries[wanted[member.name]] = pickle.load(tar.extractfile(member), encoding='latin1')
+        missing = set(file_names) - set(entries)
+        if missing:
+            raise RuntimeError(f'Members {sorted(missing)} not found in {self.filename}.')
 
-        return data_infos
+        return entries
 
     def _load_meta(self):
         """Load meta data list.
         """
         meta_path = osp.join(self.data_path_prefix, self.base_folder, self.meta['filename'])
-        if not check_integrity(meta_path, self.meta['md5']):
+        if not check_integrity(meta_path, self.meta['md5'], verify=self.verify):
             raise RuntimeError(
                 'Dataset metadata file not found or corrupted.' +
                 ' You can use download=True to download it')
@@ -109,13 +206,15 @@ class CIFAR10(BaseDataset):
             :bool: whether the data is integrity.
         """
         root = self.data_path_prefix
-        for data_list in (self.train_list + self.test_list):
-            filename, md5 = data_list[0], data_list[1]
-            filepath = osp.join(root, self.base_folder, filename)
-            if not check_integrity(filepath, md5):
-                return False
+        if self.from_archive:
+            # the archive is hashed once, later checks hit the md5 manifest
+            return check_integrity(osp.join(root, self.filename), self.tgz_md5, verify=self.verify)
+        files = [
+            (osp.join(root, self.base_folder, filename), md5)
+            for filename, md5 in (self.train_list + self.test_list)
+        ]
 
-        return True
+        return check_integrity_many(files, verify=self.verify)
 
 
 @DATASETS.register_module()
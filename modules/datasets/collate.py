@@ -0,0 +1,31 @@
+from collections.abc import Mapping
+import numpy as np
+import torch
+from mmcv.parallel import collate
+
+__all__ = ['batch_collate']
+
+
+def batch_collate(batch, samples_per_gpu=1):
+    """Collate the output of ``BaseDataset.__getitems__``.
+    Batches of the batched fast path are already stacked, so their arrays are only wrapped as tensors without
+    copy. Lists of samples fall back to :func:`mmcv.parallel.collate`.
+    Args:
+        batch (dict | list, required): Stacked batch or list of samples.
+        samples_per_gpu (int, optional): Number of samples per gpu, used by the fallback. Default to 1.
+    Return:
+        :dict: The collated batch.
+    """
+    if not isinstance(batch, Mapping):
+        return collate(batch, samples_per_gpu)
+
+    collated = {}
+    for key, value in batch.items():
+        if isinstance(value, np.ndarray):
+            # torch can not wrap read-only memory
+            if not value.flags.writeable:
+                value = np.array(value)
+            value = torch.from_numpy(value)
+        collated[key] = value
+
+    return collated
@@ -1,6 +1,9 @@
+import os.path as osp
 import numpy as np
 from .base_dataset import BaseDataset
 from .builder import DATASETS
+from .index_cache import AnnotationIndexCache, file_fingerprint
+from .sample_table import SampleTable, StringTable
 
 
 @DATASETS.register_module()
@@ -16,6 +19,11 @@ class CUB(BaseDataset):
             image_class_labels.txt in CUB.
         train_test_split_file (str): the split file.
             train_test_split_file.txt in CUB.
+        index_cache (dict, optional): Config of the on-disk index of the parsed samples, e.g.
+            ``dict(cache_dir='~/.cache/qcls', check='mtime')``. ``check`` is 'mtime' or 'content' and
+            decides how changed annotation files are detected. Defaults to None.
+        bytes_cache (dict, optional): Config of the cache of encoded files shared by all ranks and workers
+            of a node, e.g. ``dict(max_bytes=4 << 30)``, see :class:`SharedBytesCache`. Defaults to None.
     """
 
     CLASSES = [
@@ -85,12 +93,49 @@ class CUB(BaseDataset):
         'Rock_Wren', 'Winter_Wren', 'Common_Yellowthroat'
     ]
 
-    def __init__(self, *args, ann_file, image_class_labels_file, train_test_split_file, **kwargs):
+    def __init__(self,
+                 *args,
+                 ann_file,
+                 image_class_labels_file,
+                 train_test_split_file,
+                 index_cache=None,
+                 bytes_cache=None,
+                 **kwargs):
         self.image_class_labels_file = image_class_labels_file
         self.train_test_split_file = train_test_split_file
+        self.index_cache = index_cache
         super(CUB, self).__init__(*args, ann_file=ann_file, **kwargs)
+        if bytes_cache is not None:
+            self.build_bytes_cache(bytes_cache)
+
+    def _build_index_cache(self):
+        """Build the index cache of the samples.
+
+        Return:
+            :AnnotationIndexCache | None: The cache, None if it is disabled.
+        """
+        if self.index_cache is None:
+            return None
+
+        ann_files = [self.ann_file, self.image_class_labels_file, self.train_test_split_file]
+        identity = {
+            'type': type(self).__name__,
+            'data_path_prefix': osp.abspath(self.data_path_prefix),
+            'ann_files': [osp.abspath(ann_file) for ann_file in ann_files],
+            'test_mode': self.test_mode
+        }
+        check = self.index_cache.get('check', 'mtime')
+        fingerprint = {'ann_files': [file_fingerprint(ann_file, check) for ann_file in ann_files]}
+
+        return AnnotationIndexCache(self.index_cache['cache_dir'], identity, fingerprint)
 
     def load_annotations(self):
+        cache = self._build_index_cache()
+        if cache is not None:
+            cached = cache.load()
+            if cached is not None:
+                return cached[0]
+
         with open(self.ann_file) as f:
             samples_list = [x.strip().split(' ')[1] for x in f.readlines()]
 
@@ -109,17 +154,14 @@ class CUB(BaseDataset):
             f'samples({len(samples_list)}), gt_labels({len(gt_labels)}) and ' \
             f'splits({len(splits_list)}) should have same length.'
 
-        data_infos = []
-        for filename, gt_label, split in zip(samples_list, gt_labels, splits_list):
-            if split and self.test_mode:
-                # skip train samples when test_mode=True
-                continue
-            elif not split and not self.test_mode:
-                # skip test samples when test_mode=False
-                continue
+        # split is 1 for train samples and 0 for test samples
+        keep = np.array(splits_list, dtype=bool) != self.test_mode
+        indices = np.flatnonzero(keep)
+        filenames = StringTable.from_list(samples_list).take(indices)
 
-            info = {'img_prefix': self.data_path_prefix, 'img_info': {'filename': filename},
-                    'gt_label': np.array(gt_label, dtype=np.int64)}
-            data_infos.append(info)
+        table = SampleTable(np.array(gt_labels, dtype=np.int64)[indices], filenames=filenames,
+                            img_prefix=self.data_path_prefix)
+        if cache is not None:
+            cache.dump(table)
 
-        return data_infos
+        return table
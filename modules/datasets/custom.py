@@ -1,9 +1,18 @@
+import os
+import os.path as osp
+import time
 import warnings
 import mmcv
 import numpy as np
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from mmcv import FileClient
+from mmcv.runner import get_dist_info
+from .ann_parser import parse_ann_file
 from .base_dataset import BaseDataset
 from .builder import DATASETS
+from .index_cache import AnnotationIndexCache, dirs_unchanged, file_fingerprint
+from .sample_table import SampleTable, StringTable
+from ..utlis import get_root_logger
 
 
 def find_folders(root, file_client):
@@ -69,6 +78,101 @@ def get_samples(root, folder_to_idx, is_valid_file, file_client):
     return samples, empty_folders
 
 
+def scan_folder(root, folder_name, is_valid_file, counter, dir_mtimes=None):
+    """Recursively list the valid files of one class folder with ``os.scandir``.
+    Hidden files are skipped like ``FileClient.list_dir_or_file`` of the local backend does.
+    Args:
+        root (str, required): The root path to be searched.
+        folder_name (str, required): Name of the class folder.
+        is_valid_file (callable, required): A function that takes path of a file
+            and check if the file is a valid sample file.
+        counter (list[int], required): Single-item list accumulating the number of visited files.
+        dir_mtimes (dict | None, optional): Filled with the modification time of every visited directory,
+            keyed by its path relative to the root. Default to None.
+    Return:
+        :list[str]: Sorted paths of the valid files, relative to the class folder.
+    """
+    files = []
+    folder = osp.join(root, folder_name)
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        dir_path = osp.join(folder, rel_dir)
+        if dir_mtimes is not None:
+            # taken before the listing, a file added meanwhile changes the time again
+            dir_mtimes[osp.normpath(osp.join(folder_name, rel_dir))] = os.stat(dir_path).st_mtime_ns
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                rel_path = osp.join(rel_dir, entry.name)
+                if not entry.name.startswith('.') and entry.is_file():
+                    counter[0] += 1
+                    if is_valid_file(rel_path):
+                        files.append(rel_path)
+                elif entry.is_dir():
+                    stack.append(rel_path)
+    files.sort()
+
+    return files
+
+
+def scan_samples(root, folder_to_idx, is_valid_file, num_threads=16, log_interval=10., dir_mtimes=None):
+    """Make dataset by scanning the class folders of a local root in parallel.
+    The folders are listed concurrently by a thread pool, which overlaps the latency of the file system,
+    and the samples keep the deterministic order of :func:`get_samples`.
+    Args:
+        root (str, required): The root path to be searched.
+        folder_to_idx (dict, required): The map from class name to class idx.
+        is_valid_file (callable, required): A function that takes path of a file
+            and check if the file is a valid sample file.
+        num_threads (int, optional): Number of scanning threads. Default to 16.
+        log_interval (float, optional): Seconds between two progress logs. Default to 10.
+        dir_mtimes (dict | None, optional): Filled with the modification time of every visited directory,
+            keyed by its path relative to the root. Default to None.
+    Return:
+        :tuple[list, set]:
+            - samples: a list of tuple where each element is (image, class_idx)
+            - empty_folders: The folders don't have any valid files.
+    """
+    logger = get_root_logger()
+    folder_names = sorted(folder_to_idx.keys())
+    counters = [[0] for _ in folder_names]
+    # one dict per folder, merged once the threads are done
+    folder_mtimes = [None if dir_mtimes is None else {} for _ in folder_names]
+    start = time.time()
+
+    with ThreadPoolExecutor(max(1, num_threads)) as executor:
+        futures = [
+            executor.submit(scan_folder, root, folder_name, is_valid_file, counter, mtimes)
+            for folder_name, counter, mtimes in zip(folder_names, counters, folder_mtimes)
+        ]
+        pending = futures
+        while pending:
+            done, pending = wait(pending, timeout=log_interval, return_when=FIRST_EXCEPTION)
+            if any(future.exception() is not None for future in done):
+                break
+            if pending:
+                visited = sum(counter[0] for counter in counters)
+                logger.info(f'scanned {visited} files of {len(futures) - len(pending)}/{len(futures)} '
+                            f'folders under {root}, {visited / (time.time() - start):.0f} files/sec')
+        folder_files = [future.result() for future in futures]
+    if dir_mtimes is not None:
+        for mtimes in folder_mtimes:
+            dir_mtimes.update(mtimes)
+
+    samples = []
+    empty_folders = set()
+    for folder_name, files in zip(folder_names, folder_files):
+        if not files:
+            empty_folders.add(folder_name)
+        samples.extend((osp.join(folder_name, file), folder_to_idx[folder_name]) for file in files)
+
+    visited = sum(counter[0] for counter in counters)
+    elapsed = max(time.time() - start, 1e-6)
+    logger.info(f'scanned {visited} files under {root} in {elapsed:.1f}s, {visited / elapsed:.0f} files/sec')
+
+    return samples, empty_folders
+
+
 @DATASETS.register_module()
 class CustomDataset(BaseDataset):
     """Custom dataset for classification. The dataset supports two kinds of annotation format.
@@ -124,6 +228,21 @@ class CustomDataset(BaseDataset):
         file_client_args (dict, optional): Arguments to instantiate a
             FileClient. If None, automatically inference from the specified path.
             Defaults to None.
+        parse_workers (int, optional): Number of processes parsing a large local ``ann_file``
+            in parallel. Defaults to 8.
+        scan_threads (int, optional): Number of threads listing the class folders of a local
+            ``data_path_prefix`` in parallel. Defaults to 16.
+        index_cache (dict, optional): Config of the on-disk index of the parsed samples, e.g.
+            ``dict(cache_dir='~/.cache/qcls', check='mtime')``. ``check`` is 'mtime' or 'content' and decides
+            how a changed ``ann_file`` is detected, the folder mode compares the modification time of
+            ``data_path_prefix`` and of its class folders. Only local data is cached. Defaults to None.
+        shard_by_rank (bool, optional): Whether every rank only keeps its contiguous part of the samples, to be
+            sampled by ``ShardedSampler``. A local ``ann_file`` is split by byte ranges and every rank only
+            parses its own range. The number of samples of every rank is stored in ``shard_sizes``.
+            Defaults to False.
+        bytes_cache (dict, optional): Config of the cache of encoded files shared by all ranks and workers
+            of a node, e.g. ``dict(max_bytes=32 << 30)``, see :class:`SharedBytesCache`. The samples then
+            carry their ``img_bytes``. Defaults to None.
     """
 
     def __init__(self,
@@ -133,9 +252,18 @@ class CustomDataset(BaseDataset):
                  ann_file=None,
                  extensions=('.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif'),
                  test_mode=False,
-                 file_client_args=None):
+                 file_client_args=None,
+                 parse_workers=8,
+                 scan_threads=16,
+                 index_cache=None,
+                 shard_by_rank=False,
+                 bytes_cache=None):
         self.extensions = tuple(set([i.lower() for i in extensions]))
         self.file_client_args = file_client_args
+        self.parse_workers = parse_workers
+        self.scan_threads = scan_threads
+        self.index_cache = index_cache
+        self.shard_by_rank = shard_by_rank
 
         super().__init__(
             data_path_prefix=data_path_prefix,
@@ -144,31 +272,41 @@ class CustomDataset(BaseDataset):
             ann_file=ann_file,
             test_mode=test_mode
         )
+        if bytes_cache is not None:
+            self.build_bytes_cache(bytes_cache)
 
-    def _find_samples(self):
+    def _find_samples(self, dir_mtimes=None):
         """find samples from ``data_path_prefix``.
+        Args:
+            dir_mtimes (dict | None, optional): Filled with the modification time of the root and of every
+                directory scanned under it, keyed by relative path, for a local root. Default to None.
         """
         file_client = FileClient.infer_client(self.file_client_args, self.data_path_prefix)
+        if dir_mtimes is not None and file_client.name == 'HardDiskBackend':
+            dir_mtimes['.'] = os.stat(self.data_path_prefix).st_mtime_ns
         classes, folder_to_idx = find_folders(self.data_path_prefix, file_client)
-        samples, empty_classes = get_samples(
-            self.data_path_prefix,
-            folder_to_idx,
-            is_valid_file=self.is_vaild_file,
-            file_client=file_client
-        )
+        if file_client.name == 'HardDiskBackend':
+            samples, empty_classes = scan_samples(
+                self.data_path_prefix,
+                folder_to_idx,
+                is_valid_file=self.is_vaild_file,
+                num_threads=self.scan_threads,
+                dir_mtimes=dir_mtimes
+            )
+        else:
+            samples, empty_classes = get_samples(
+                self.data_path_prefix,
+                folder_to_idx,
+                is_valid_file=self.is_vaild_file,
+                file_client=file_client
+            )
 
         if len(samples) == 0:
             raise RuntimeError(
                 f'Found 0 files in subfolders of: {self.data_path_prefix}. '
                 f'Supported extensions are: {",".join(self.extensions)}')
 
-        if self.CLASSES is not None:
-            assert len(self.CLASSES) == len(classes), \
-                f"The number of subfolders ({len(classes)}) doesn't match " \
-                f'the number of specified classes ({len(self.CLASSES)}). ' \
-                'Please check the data folder.'
-        else:
-            self.CLASSES = classes
+        self._set_folders(classes, folder_to_idx)
 
         if empty_classes:
             warnings.warn(
@@ -178,29 +316,112 @@ class CustomDataset(BaseDataset):
                 UserWarning
             )
 
+        return samples
+
+    def _set_folders(self, classes, folder_to_idx):
+        """Check the class folders against the specified classes.
+        Args:
+            classes (list[str], required): The name of class folders.
+            folder_to_idx (dict, required): The map from folder name to class idx.
+        """
+        if self.CLASSES is not None:
+            assert len(self.CLASSES) == len(classes), \
+                f"The number of subfolders ({len(classes)}) doesn't match " \
+                f'the number of specified classes ({len(self.CLASSES)}). ' \
+                'Please check the data folder.'
+        else:
+            self.CLASSES = classes
+
         self.folder_to_idx = folder_to_idx
 
-        return samples
+    def _shard_range(self, size):
+        """Get the contiguous part of the current rank.
+        Args:
+            size (int, required): Number of samples or of bytes to be split.
+        Return:
+            :tuple[int, int]: Start and end of the part of the rank.
+        """
+        rank, world_size = get_dist_info()
+
+        return size * rank // world_size, size * (rank + 1) // world_size
+
+    def _build_index_cache(self):
+        """Build the index cache of the samples.
+
+        Return:
+            :AnnotationIndexCache | None: The cache, None if it is disabled or the data is not local.
+        """
+        if self.index_cache is None:
+            return None
+        file_client = FileClient.infer_client(self.file_client_args, self.data_path_prefix)
+        if file_client.name != 'HardDiskBackend':
+            return None
+
+        identity = {
+            'type': type(self).__name__,
+            'data_path_prefix': osp.abspath(self.data_path_prefix),
+            'ann_file': None if self.ann_file is None else osp.abspath(self.ann_file)
+        }
+        if self.shard_by_rank:
+            identity['shard'] = list(get_dist_info())
+        fingerprint = {'classes': None if self.CLASSES is None else list(self.CLASSES)}
+        if self.ann_file is None:
+            # the directories of the scan are stored with the table and checked by ``load_annotations``
+            fingerprint['extensions'] = sorted(self.extensions)
+        else:
+            fingerprint['ann_file'] = file_fingerprint(self.ann_file, self.index_cache.get('check', 'mtime'))
+
+        return AnnotationIndexCache(self.index_cache['cache_dir'], identity, fingerprint)
 
     def load_annotations(self):
         """Load image paths and gt_labels.
         """
+        cache = self._build_index_cache()
+        if cache is not None:
+            cached = cache.load()
+            # a file added to or removed from any scanned directory, at any depth, changes its time
+            if cached is not None and (self.ann_file is not None or dirs_unchanged(self.data_path_prefix,
+                                                                                    cached[1].get('dirs'))):
+                table, extra = cached
+                if self.ann_file is None:
+                    folders = extra['folders']
+                    self._set_folders(folders, {folders[i]: i for i in range(len(folders))})
+                return table
+
+        extra = {}
+        # a local ann_file is split in bytes before parsing, other sources are split once loaded
+        split_table = self.shard_by_rank
         if self.ann_file is None:
-            samples = self._find_samples()
+            extra['dirs'] = {}
+            samples = self._find_samples(dir_mtimes=extra['dirs'])
+            extra['folders'] = list(self.folder_to_idx)
         elif isinstance(self.ann_file, str):
-            lines = mmcv.list_from_file(
-                self.ann_file, file_client_args=self.file_client_args)
-            samples = [x.strip().rsplit(' ', 1) for x in lines]
+            if FileClient.infer_client(self.file_client_args, self.ann_file).name == 'HardDiskBackend':
+                samples = None
+                filenames, gt_labels = parse_ann_file(
+                    self.ann_file,
+                    byte_range=self._shard_range(osp.getsize(self.ann_file)) if self.shard_by_rank else None,
+                    num_workers=self.parse_workers
+                )
+                split_table = False
+            else:
+                lines = mmcv.list_from_file(
+                    self.ann_file, file_client_args=self.file_client_args)
+                samples = [x.strip().rsplit(' ', 1) for x in lines]
         else:
             raise TypeError('ann_file must be a str or None')
 
-        data_infos = []
-        for filename, gt_label in samples:
-            info = {'img_prefix': self.data_path_prefix, 'img_info': {'filename': filename},
-                    'gt_label': np.array(gt_label, dtype=np.int64)}
-            data_infos.append(info)
+        if samples is not None:
+            gt_labels = np.array([gt_label for _, gt_label in samples], dtype=np.int64)
+            filenames = StringTable.from_list([filename for filename, _ in samples])
+
+        table = SampleTable(gt_labels, filenames=filenames, img_prefix=self.data_path_prefix)
+        if split_table:
+            table = table.take(np.arange(*self._shard_range(len(table))))
+        if cache is not None:
+            cache.dump(table, extra)
 
-        return data_infos
+        return table
 
     def is_vaild_file(self, filename):
         """Check if a file is a valid sample.
@@ -0,0 +1,284 @@
+from abc import ABCMeta, abstractmethod
+from collections.abc import Mapping
+import numpy as np
+from torch.utils.data import Dataset
+from .builder import DATASETS
+
+__all__ = ['ConcatDataset', 'RepeatDataset', 'ClassBalancedDataset', 'BatchedFetchDataset']
+
+
+def _merge_batches(parts, positions, num):
+    """Merge the batches fetched from several datasets back into the requested order.
+    Args:
+        parts (list[dict | list], required): Stacked batch or list of samples of every group of indices.
+        positions (list[np.ndarray], required): Position in the requested batch of every sample of each part.
+        num (int, required): Number of samples of the requested batch.
+    Return:
+        :dict | list: One stacked batch if all parts are stacked batches of the same layout, else a list.
+    """
+    if all(isinstance(part, Mapping) for part in parts) and len({tuple(part) for part in parts}) == 1:
+        order = np.argsort(np.concatenate(positions), kind='stable')
+        try:
+            return {key: np.concatenate([part[key] for part in parts])[order] for key in parts[0]}
+        except (ValueError, TypeError):
+            pass
+
+    samples = [None] * num
+    for part, part_positions in zip(parts, positions):
+        if isinstance(part, Mapping):
+            part = [{key: value[i] for key, value in part.items()} for i in range(len(part_positions))]
+        for position, sample in zip(part_positions, part):
+            samples[position] = sample
+
+    return samples
+
+
+def _fetch(dataset, indices, batched):
+    """Fetch a batch, through the batched path of a dataset when asked and available.
+    Args:
+        dataset (Dataset, required): The dataset.
+        indices (np.ndarray, required): Indices of data.
+        batched (bool, required): Whether stacked batches are accepted.
+    Return:
+        :dict | list: Stacked batch or list of samples.
+    """
+    if batched and hasattr(dataset, 'prepare_batch'):
+        return dataset.prepare_batch(indices.tolist())
+    if hasattr(dataset, '__getitems__'):
+        return dataset.__getitems__(indices.tolist())
+
+    return [dataset[idx] for idx in indices.tolist()]
+
+
+class _IndexMappedDataset(Dataset, metaclass=ABCMeta):
+    """Base of the wrappers, which map their indices to the indices of wrapped datasets without copying
+    any sample record.
+    """
+
+    def __init__(self, datasets):
+        self.datasets = list(datasets)
+        self.CLASSES = self.datasets[0].CLASSES
+
+    @property
+    def batched_fetch(self):
+        return all(getattr(dataset, 'batched_fetch', False) for dataset in self.datasets)
+
+    @batched_fetch.setter
+    def batched_fetch(self, value):
+        for dataset in self.datasets:
+            if hasattr(dataset, 'batched_fetch'):
+                dataset.batched_fetch = value
+
+    @abstractmethod
+    def map_indices(self, indices):
+        """Map indices of the wrapper to the wrapped datasets.
+        Args:
+            indices (np.ndarray, required): int64 indices of the wrapper.
+        Return:
+            :tuple[np.ndarray, np.ndarray]: Index of the wrapped dataset and index inside it.
+        """
+        pass
+
+    def _check_indices(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError(f'indices out of range for a dataset of {len(self)} samples')
+
+        return indices
+
+    def __getitem__(self, idx):
+        dataset_idx, sample_idx = self.map_indices(self._check_indices([idx]))
+
+        return self.datasets[dataset_idx[0]][int(sample_idx[0])]
+
+    def _fetch_groups(self, indices, batched):
+        """Fetch a batch, grouping the indices by wrapped dataset.
+        Args:
+            indices (list[int], required): Indices of data.
+            batched (bool, required): Whether stacked batches are accepted.
+        Return:
+            :dict | list: Stacked batch or list of samples.
+        """
+        dataset_idx, sample_idx = self.map_indices(self._check_indices(indices))
+        groups = np.unique(dataset_idx)
+        if len(groups) == 1:
+            return _fetch(self.datasets[groups[0]], sample_idx, batched)
+
+        positions = [np.flatnonzero(dataset_idx == group) for group in groups]
+        parts = [_fetch(self.datasets[group], sample_idx[pos], batched) for group, pos in zip(groups, positions)]
+
+        return _merge_batches(parts, positions, len(sample_idx))
+
+    def __getitems__(self, indices):
+        """Index a batch of data, used by the auto-batching of ``DataLoader``.
+        Args:
+            indices (list[int], required): Indices of data.
+        Return:
+            :dict | list: Batch to be collated by :func:`batch_collate`, stacked only if ``batched_fetch``.
+        """
+        return self._fetch_groups(indices, self.batched_fetch)
+
+    def prepare_batch(self, indices):
+        """Prepare several samples at once through the batched path of the wrapped datasets.
+        Args:
+            indices (Sequence[int], required): Indices of data.
+        Return:
+            :dict | list: Stacked batch, or list of samples when some wrapped dataset has no batched path.
+        """
+        return self._fetch_groups(indices, True)
+
+    def get_gt_labels(self):
+        """Get all ground-truth labels (categories).
+
+        Return:
+            :np.ndarray: categories for all images.
+        """
+        dataset_idx, sample_idx = self.map_indices(np.arange(len(self), dtype=np.int64))
+        labels = np.zeros(len(self), dtype=np.int64)
+        for i, dataset in enumerate(self.datasets):
+            mask = dataset_idx == i
+            labels[mask] = np.asarray(dataset.get_gt_labels())[sample_idx[mask]]
+
+        return labels
+
+    def get_category_ids(self, idx):
+        """Get category id by index.
+        Args:
+            idx (int, required): Index of data.
+        Return:
+            :list[int]: Image category of specified index.
+        """
+        dataset_idx, sample_idx = self.map_indices(self._check_indices([idx]))
+
+        return self.datasets[dataset_idx[0]].get_category_ids(int(sample_idx[0]))
+
+
+@DATASETS.register_module()
+class ConcatDataset(_IndexMappedDataset):
+    """A wrapper of concatenated dataset.
+    Same as :obj:`torch.utils.data.dataset.ConcatDataset`, but the wrapped dataset of every index is found
+    with ``np.searchsorted`` over the cumulative sizes, for whole batches at once.
+    Args:
+        datasets (list[Dataset], required): A list of datasets.
+    """
+
+    def __init__(self, datasets):
+        super(ConcatDataset, self).__init__(datasets)
+        self.cumulative_sizes = np.cumsum([len(dataset) for dataset in self.datasets]).astype(np.int64)
+
+    def map_indices(self, indices):
+        dataset_idx = np.searchsorted(self.cumulative_sizes, indices, side='right')
+        starts = np.concatenate([[0], self.cumulative_sizes[:-1]])
+
+        return dataset_idx, indices - starts[dataset_idx]
+
+    def __len__(self):
+        return int(self.cumulative_sizes[-1]) if len(self.cumulative_sizes) else 0
+
+
+@DATASETS.register_module()
+class RepeatDataset(_IndexMappedDataset):
+    """A wrapper of repeated dataset.
+    The length of repeated dataset will be `times` larger than the original dataset. This is useful when
+    the data loading time is long but the dataset is small. Using RepeatDataset can reduce the data loading
+    time between epochs.
+    Args:
+        dataset (Dataset, required): The dataset to be repeated.
+        times (int, required): Repeat times.
+    """
+
+    def __init__(self, dataset, times):
+        super(RepeatDataset, self).__init__([dataset])
+        self.dataset = dataset
+        self.times = times
+        self._ori_len = len(dataset)
+
+    def map_indices(self, indices):
+        return np.zeros(len(indices), dtype=np.int64), indices % self._ori_len
+
+    def get_gt_labels(self):
+        return np.tile(np.asarray(self.dataset.get_gt_labels()), self.times)
+
+    def __len__(self):
+        return self.times * self._ori_len
+
+
+@DATASETS.register_module()
+class ClassBalancedDataset(_IndexMappedDataset):
+    """A wrapper of repeated dataset with repeat factor.
+    Suitable for training on class imbalanced datasets like LVIS. Following the sampling strategy in
+    `this paper <https://arxiv.org/abs/1908.03195>`_, every sample is repeated ``ceil(r)`` times with
+    ``r = max(1, sqrt(oversample_thr / f))``, ``f`` being the frequency of its class. The repeats are only
+    recorded as cumulative counts, which ``np.searchsorted`` maps back to the samples.
+    Args:
+        dataset (Dataset, required): The dataset to be repeated.
+        oversample_thr (float, required): Frequency threshold below which data is repeated. For categories
+            with ``f_c >= oversample_thr``, there is no oversampling.
+    """
+
+    def __init__(self, dataset, oversample_thr):
+        super(ClassBalancedDataset, self).__init__([dataset])
+        self.dataset = dataset
+        self.oversample_thr = oversample_thr
+
+        repeat_factors = self._get_repeat_factors(dataset, oversample_thr)
+        self.repeats = np.ceil(repeat_factors).astype(np.int64)
+        self.cumulative_repeats = np.cumsum(self.repeats)
+
+    @staticmethod
+    def _get_repeat_factors(dataset, repeat_thr):
+        """Get the repeat factor of every sample from the frequency of its class.
+        Args:
+            dataset (Dataset, required): The dataset.
+            repeat_thr (float, required): Threshold of frequency.
+        Return:
+            :np.ndarray: The repeat factors of the samples.
+        """
+        labels = np.asarray(dataset.get_gt_labels(), dtype=np.int64)
+        class_freq = np.bincount(labels) / max(len(labels), 1)
+        with np.errstate(divide='ignore'):
+            class_repeat = np.maximum(1., np.sqrt(repeat_thr / class_freq))
+
+        return class_repeat[labels]
+
+    def map_indices(self, indices):
+        sample_idx = np.searchsorted(self.cumulative_repeats, indices, side='right')
+
+        return np.zeros(len(indices), dtype=np.int64), sample_idx
+
+    def get_gt_labels(self):
+        return np.repeat(np.asarray(self.dataset.get_gt_labels()), self.repeats)
+
+    def __len__(self):
+        return int(self.cumulative_repeats[-1]) if len(self.cumulative_repeats) else 0
+
+
+class BatchedFetchDataset(Dataset):
+    """View of a dataset fetching whole batches through its batched path, e.g. :meth:`BaseDataset.prepare_batch`.
+    ``build_dataloader`` loads the datasets through this view, whose collate functions accept stacked batches,
+    instead of setting ``batched_fetch`` on them. The wrapped dataset is left unchanged, so other loaders of
+    it keep receiving lists of samples. Other attributes are read from the wrapped dataset.
+    Args:
+        dataset (Dataset, required): The dataset, with a ``prepare_batch`` method.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getattr__(self, name):
+        # only called for missing attributes, ``dataset`` is missing while unpickling
+        dataset = self.__dict__.get('dataset')
+        if dataset is None:
+            raise AttributeError(name)
+
+        return getattr(dataset, name)
+
+    def __getitem__(self, idx):
+        return self.dataset[idx]
+
+    def __getitems__(self, indices):
+        return _fetch(self.dataset, np.asarray(indices, dtype=np.int64), True)
+
+    def __len__(self):
+        return len(self.dataset)
@@ -0,0 +1,186 @@
+import os
+from collections.abc import Mapping
+import numpy as np
+import torch
+from torch.utils.data import get_worker_info
+from .builder import COLLATE_FUNCTIONS
+from .collate import batch_collate
+
+__all__ = ['FastCollate', 'SlotBatch']
+
+
+class SlotBatch(dict):
+    """Batch collated by :class:`FastCollate`, whose tensors are views of a slot of a ring of buffers.
+    The generation of the slot is recorded when the batch is written and compared with the current one,
+    shared with the process owning the ring, whenever a field is read: reading a batch whose slot has been
+    reused by a later batch raises instead of silently returning the data of the later batch. Tensors taken
+    out of the batch before are not checked.
+    """
+
+    def __init__(self, fields, generations, slot):
+        super(SlotBatch, self).__init__(fields)
+        self.generations = generations
+        self.slot = slot
+        self.generation = int(generations[slot])
+
+    def check(self):
+        """Raise if the slot of the batch has been reused."""
+        if int(self.generations[self.slot]) != self.generation:
+            raise RuntimeError(f'The slot {self.slot} of this batch has been overwritten by a later batch, '
+                               'copy the batches kept beyond num_slots steps of FastCollate.')
+
+    def __getitem__(self, key):
+        self.check()
+
+        return super(SlotBatch, self).__getitem__(key)
+
+
+@COLLATE_FUNCTIONS.register_module()
+class FastCollate(object):
+    """Collate function writing the samples into preallocated shared memory batch buffers.
+    Every process, i.e. every DataLoader worker or the main process without workers, owns a ring of
+    ``num_slots`` batch buffers per field, allocated in shared memory on first use and reused for the
+    following batches. The samples are copied once into the next slot instead of being stacked into a new
+    tensor, and sending a slot to the main process only passes its shared memory handle, so no batch is
+    allocated or copied again per step.
+
+    A slot is overwritten ``num_slots`` batches of the same worker later. A worker prepares at most
+    ``prefetch_factor`` batches ahead of the one being consumed, so a batch stays valid until the next one
+    is requested as long as ``num_slots >= prefetch_factor + 2``. Keep a copy of a batch which has to live
+    longer, reading a field of an overwritten :class:`SlotBatch` raises. Fields which can not be stacked,
+    e.g. strings, are returned as lists.
+
+    ``build_dataloader`` hands ``pin_memory`` to the collate function and disables the pinning thread of
+    ``DataLoader``, which would copy every batch into new pinned memory. Without workers the slots are then
+    allocated in pinned memory, the slots of workers stay in shared memory, which can not be pinned by them.
+    Args:
+        batch_size (int, required): Maximum number of samples of a batch.
+        prefetch_factor (int, optional): Number of batches loaded in advance by each worker. Default to 2.
+        num_slots (int | None, optional): Number of buffers of the ring. Default to None,
+            ``prefetch_factor + 2``.
+        samples_per_gpu (int, optional): Number of samples per gpu, used by the fallback to
+            :func:`batch_collate`. Default to 1.
+        pin_memory (bool, optional): Whether to allocate the slots of the main process in pinned memory.
+            Default to False.
+    """
+
+    def __init__(self, batch_size, prefetch_factor=2, num_slots=None, samples_per_gpu=1, pin_memory=False):
+        self.batch_size = batch_size
+        self.pin_memory = pin_memory
+        self.num_slots = num_slots if num_slots is not None else prefetch_factor + 2
+        assert self.num_slots >= prefetch_factor + 2, \
+            f'num_slots({self.num_slots}) should be at least prefetch_factor + 2({prefetch_factor + 2}).'
+        self.samples_per_gpu = samples_per_gpu
+        self._reset()
+
+    def _reset(self):
+        # the buffers belong to one process, forked or spawned workers allocate their own
+        self._pid = os.getpid()
+        self._rings = {}
+        self._step = 0
+        # generation of every slot, shared with the processes receiving the batches
+        self._generations = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_rings'] = {}
+        state['_generations'] = None
+
+        return state
+
+    def _slot(self, key, shape, dtype, slot):
+        """Get the numpy view of a slot, reallocating the ring when the sample layout changes.
+        Args:
+            key (str, required): Name of the field.
+            shape (tuple[int], required): Shape of one sample.
+            dtype (np.dtype, required): Data type of the field.
+            slot (int, required): Index of the slot in the ring.
+        Return:
+            :tuple[torch.Tensor, np.ndarray]: The buffer of the slot and its numpy view.
+        """
+        ring = self._rings.get(key)
+        if ring is None or ring[0][1].shape[1:] != shape or ring[0][1].dtype != dtype:
+            # batches of the main process are not sent anywhere, pinned memory speeds up their copy to the gpu
+            pinned = self.pin_memory and get_worker_info() is None and torch.cuda.is_available()
+            ring = []
+            for _ in range(self.num_slots):
+                buffer = torch.from_numpy(np.empty((self.batch_size, ) + shape, dtype=dtype))
+                buffer = buffer.pin_memory() if pinned else buffer.share_memory_()
+                ring.append((buffer, buffer.numpy()))
+            self._rings[key] = ring
+
+        return ring[slot]
+
+    @staticmethod
+    def _stackable(values):
+        """Check whether the values of a field can be written into one buffer.
+        Args:
+            values (list, required): The values of one field for every sample.
+        Return:
+            :np.ndarray | None: The first value as array, None if the values can not be stacked.
+        """
+        first = values[0]
+        if not isinstance(first, (np.ndarray, np.generic, torch.Tensor, int, float, bool)):
+            return None
+        first = first.numpy() if isinstance(first, torch.Tensor) else np.asarray(first)
+        if first.dtype == object:
+            return None
+        for value in values[1:]:
+            if np.shape(value) != first.shape:
+                return None
+
+        return first
+
+    def _fill(self, key, values, slot):
+        """Write the values of one field into a slot.
+        Args:
+            key (str, required): Name of the field.
+            values (np.ndarray | torch.Tensor | list, required): A stacked array or the value of every sample.
+            slot (int, required): Index of the slot in the ring.
+        Return:
+            :torch.Tensor | list: The batch of the field.
+        """
+        if isinstance(values, torch.Tensor):
+            values = values.numpy()
+        if isinstance(values, np.ndarray):
+            if values.dtype == object:
+                return list(values)
+            if len(values) > self.batch_size:
+                return torch.from_numpy(np.array(values))
+            buffer, array = self._slot(key, values.shape[1:], values.dtype, slot)
+            array[:len(values)] = values
+            return buffer[:len(values)]
+
+        first = self._stackable(values) if len(values) <= self.batch_size else None
+        if first is None:
+            return list(values)
+        buffer, array = self._slot(key, first.shape, first.dtype, slot)
+        for i, value in enumerate(values):
+            array[i] = value.numpy() if isinstance(value, torch.Tensor) else value
+
+        return buffer[:len(values)]
+
+    def __call__(self, batch):
+        """Collate a batch into the next slot of the ring.
+        Args:
+            batch (dict | list, required): Stacked batch or list of samples, see :func:`batch_collate`.
+        Return:
+            :SlotBatch | list: The collated batch, whose tensors are views of the slot.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        if not isinstance(batch, Mapping) and (not batch or not all(isinstance(sample, Mapping) for sample in batch)):
+            return batch_collate(batch, self.samples_per_gpu)
+        if self._generations is None:
+            self._generations = torch.zeros(self.num_slots, dtype=torch.int64).share_memory_()
+        slot = self._step % self.num_slots
+        self._step += 1
+        # bumped before writing, the batches still holding the slot see it is reused
+        self._generations[slot] += 1
+
+        if isinstance(batch, Mapping):
+            fields = {key: self._fill(key, value, slot) for key, value in batch.items()}
+        else:
+            fields = {key: self._fill(key, [sample[key] for sample in batch], slot) for key in batch[0]}
+
+        return SlotBatch(fields, self._generations, slot)
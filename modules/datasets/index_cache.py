@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import os.path as osp
+import struct
+import numpy as np
+from .sample_table import SampleTable
+
+__all__ = ['dump_arrays', 'load_arrays', 'AnnotationIndexCache']
+
+_MAGIC = b'QCLSIDX1'
+_ALIGN = 64
+
+
+def dump_arrays(file_path, arrays, meta=None):
+    """Dump arrays into one binary file which can be memory-mapped.
+    The file starts with a magic, the length of a json header describing the dtype, shape and offset of
+    every array, then the header itself and the raw arrays aligned to 64 bytes. The file is written
+    aside and renamed, so readers never see a partial file.
+    Args:
+        file_path (str, required): Path of the output file.
+        arrays (dict[str, np.ndarray], required): Arrays to be dumped.
+        meta (dict | None, optional): Json serializable information stored in the header. Default to None.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({'meta': meta or {}, 'arrays': layout}).encode('utf-8')
+    data_start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    os.makedirs(osp.dirname(osp.abspath(file_path)), exist_ok=True)
+    tmp_path = f'{file_path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.data)
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, file_path)
+
+
+def load_arrays(file_path, mmap=True):
+    """Load the arrays written by :func:`dump_arrays`.
+    Args:
+        file_path (str, required): Path of the binary file.
+        mmap (bool, optional): Whether to memory-map the arrays instead of reading them. Default to True.
+    Return:
+        :tuple[dict[str, np.ndarray], dict]: The arrays and the meta information.
+    """
+    with open(file_path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f'{file_path} is not a qcls index file.')
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    data_start = -(-(len(_MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype, shape = np.dtype(info['dtype']), tuple(info['shape'])
+        offset = data_start + info['offset']
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        elif mmap:
+            arrays[name] = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            arrays[name] = np.fromfile(
+                file_path, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+    return arrays, header['meta']
+
+
+def file_fingerprint(file_path, check='mtime'):
+    """Fingerprint of a local file.
+    Args:
+        file_path (str, required): Path of the file.
+        check (str, optional): 'mtime' uses size and modification time, 'content' hashes the content.
+            Default to 'mtime'.
+    Return:
+        :list: The fingerprint.
+    """
+    stat = os.stat(file_path)
+    if check == 'content':
+        sha1 = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        return [stat.st_size, sha1.hexdigest()]
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def dirs_unchanged(root, dir_mtimes):
+    """Check that the directories recorded by a scan still have the same modification times.
+    Adding, removing or renaming an entry of a directory updates its own modification time, so the
+    recorded directories, at every depth, tell whether the scan is still valid without listing them.
+    Args:
+        root (str, required): The scanned root.
+        dir_mtimes (dict[str, int] | None, required): Modification time of every directory of the scan,
+            keyed by its path relative to the root.
+    Return:
+        :bool: False if any directory changed or disappeared, or if nothing was recorded.
+    """
+    if not dir_mtimes:
+        return False
+    for rel_dir, mtime in dir_mtimes.items():
+        try:
+            if os.stat(osp.join(root, rel_dir)).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            return False
+
+    return True
+
+
+class AnnotationIndexCache(object):
+    """On-disk cache of the :class:`SampleTable` parsed by ``load_annotations``.
+    The cache file is named after the identity of the dataset (class, data prefix, annotation files and
+    split) and stores a fingerprint of its sources. A cache whose fingerprint differs from the current one
+    is stale: it is ignored and overwritten by the next :meth:`dump`.
+    Args:
+        cache_dir (str, required): Directory of the cache files.
+        identity (dict, required): Json serializable description of the dataset naming the cache file.
+        fingerprint (dict, required): Json serializable description of the sources, e.g. file mtimes,
+            extensions and classes.
+    """
+
+    def __init__(self, cache_dir, identity, fingerprint):
+        identity = json.dumps(identity, sort_keys=True)
+        name = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+        self.file_path = osp.join(osp.expanduser(cache_dir), f'{name}.idx')
+        # round trip through json so the fingerprint compares equal to the loaded one
+        self.fingerprint = json.loads(json.dumps(fingerprint, sort_keys=True))
+
+    def load(self):
+        """Load the cached table.
+
+        Return:
+            :tuple[SampleTable, dict] | None: The memory-mapped table and the extra information dumped
+                with it, or None when the cache is missing or stale.
+        """
+        if not osp.isfile(self.file_path):
+            return None
+        try:
+            arrays, meta = load_arrays(self.file_path)
+        except (OSError, ValueError):
+            return None
+        if meta.get('fingerprint') != self.fingerprint:
+            return None
+
+        return SampleTable.from_arrays(arrays, img_prefix=meta['img_prefix']), meta['extra']
+
+    def dump(self, table, extra=None):
+        """Dump the table into the cache.
+        Args:
+            table (SampleTable, required): The parsed samples.
+            extra (dict | None, optional): Json serializable information to be restored with the table,
+                e.g. the class list. Default to None.
+        """
+        meta = {'fingerprint': self.fingerprint, 'img_prefix': table.img_prefix, 'extra': extra or {}}
+        dump_arrays(self.file_path, table.to_arrays(), meta)
@@ -7,7 +7,9 @@ import torch.distributed as dist
 from mmcv.runner import get_dist_info, master_only
 from .base_dataset import BaseDataset
 from .builder import DATASETS
-from .utils import rm_suffix, download_and_extract_archive
+from .sample_table import SampleTable
+from .shared_memory import share_arrays_on_node
+from .utils import rm_suffix, download_urls, extract_archive
 
 
 def get_int(b):
@@ -34,6 +36,76 @@ def open_maybe_compressed_file(path):
     return open(path, 'rb')
 
 
+SN3_TYPEMAP = {
+    8: (torch.uint8, np.uint8, np.uint8),
+    9: (torch.int8, np.int8, np.int8),
+    11: (torch.int16, np.dtype('>i2'), 'i2'),
+    12: (torch.int32, np.dtype('>i4'), 'i4'),
+    13: (torch.float32, np.dtype('>f4'), 'f4'),
+    14: (torch.float64, np.dtype('>f8'), 'f8')
+}
+
+
+def decode_compressed_file(path, chunk_size=1024 * 1024):
+    """Decode a '.gz' or '.xz' file once into the raw file next to it.
+    Args:
+        path (str, required): Path ends with '.gz' or '.xz'.
+        chunk_size (int, optional): Size of the decompressed blocks. Default to 1024 * 1024.
+    Return:
+        :str: Path of the raw file, the suffix of `path` removed.
+    """
+    raw_path = rm_suffix(path)
+    if not osp.exists(raw_path) or osp.getmtime(raw_path) < osp.getmtime(path):
+        tmp_path = f'{raw_path}.tmp-{os.getpid()}'
+        with open_maybe_compressed_file(path) as f, open(tmp_path, 'wb') as out_f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                out_f.write(chunk)
+        os.replace(tmp_path, raw_path)
+
+    return raw_path
+
+
+def read_sn3_pascal_vincent_array(path, strict=True, mmap=True):
+    """Read a SN3 file in "Pascal Vincent" format (Lush file 'libidx/idx-io.lsh') as numpy array.
+    Uncompressed files are memory-mapped, so only the header is read and the pages of the data are loaded on
+    demand. Compressed files are decoded once into a raw file next to them, which is memory-mapped as well.
+    Args:
+        path (str, required): Argument may be a filename, compressed filename, or file object.
+        strict (bool, optional): Whether to read strictly. Default to True.
+        mmap (bool, optional): Whether to memory-map files given by name. Default to True.
+    Return:
+        :np.ndarray: Array of reading file, read-only when memory-mapped.
+    """
+    if isinstance(path, str) and mmap and path.endswith(('.gz', '.xz')):
+        try:
+            path = decode_compressed_file(path)
+        except OSError:
+            # e.g. read-only dataset folder, decode in memory
+            mmap = False
+    # read the header
+    with open_maybe_compressed_file(path) as f:
+        magic = get_int(f.read(4))
+        nd = magic % 256
+        ty = magic // 256
+        assert 1 <= nd <= 3
+        assert 8 <= ty <= 14
+        m = SN3_TYPEMAP[ty]
+        s = [get_int(f.read(4)) for _ in range(nd)]
+        offset = 4 * (nd + 1)
+        if not (isinstance(path, str) and mmap):
+            data = f.read()
+    # parse
+    if isinstance(path, str) and mmap:
+        count = (osp.getsize(path) - offset) // np.dtype(m[1]).itemsize
+        assert count == np.prod(s) or not strict
+        parsed = np.memmap(path, dtype=m[1], mode='r', offset=offset, shape=(count, ))
+    else:
+        parsed = np.frombuffer(data, dtype=m[1])
+        assert parsed.shape[0] == np.prod(s) or not strict
+
+    return parsed.astype(m[2], copy=False).reshape(*s)
+
+
 def read_sn3_pascal_vincent_tensor(path, strict=True):
     """Read a SN3 file in "Pascal Vincent" format (Lush file 'libidx/idx-io.lsh').
     Args:
@@ -42,59 +114,39 @@ def read_sn3_pascal_vincent_tensor(path, strict=True):
     Return:
         :torch.Tensor: Tensor of reading file.
     """
-    # check and set typemap properties
-    if not hasattr(read_sn3_pascal_vincent_tensor, 'typemap'):
-        read_sn3_pascal_vincent_tensor.typemap = {
-            8: (torch.uint8, np.uint8, np.uint8),
-            9: (torch.int8, np.int8, np.int8),
-            11: (torch.int16, np.dtype('>i2'), 'i2'),
-            12: (torch.int32, np.dtype('>i4'), 'i4'),
-            13: (torch.float32, np.dtype('>f4'), 'f4'),
-            14: (torch.float64, np.dtype('>f8'), 'f8')
-        }
-    # read decompresses file
-    with open_maybe_compressed_file(path) as f:
-        data = f.read()
-    # parse
-    magic = get_int(data[0:4])
-    nd = magic % 256
-    ty = magic // 256
-    assert 1 <= nd <= 3
-    assert 8 <= ty <= 14
-    m = read_sn3_pascal_vincent_tensor.typemap[ty]
-    s = [get_int(data[4 * (i + 1):4 * (i + 2)]) for i in range(nd)]
-    parsed = np.frombuffer(data, dtype=m[1], offset=(4 * (nd + 1)))
-    assert parsed.shape[0] == np.prod(s) or not strict
+    parsed = read_sn3_pascal_vincent_array(path, strict=strict, mmap=False)
 
-    return torch.from_numpy(parsed.astype(m[2], copy=False)).view(*s)
+    return torch.from_numpy(parsed)
 
 
-def read_label_file(path):
+def read_label_file(path, mmap=True):
     """Read label file from path.
     Args:
         path (str, required): Path of label file.
+        mmap (bool, optional): Whether to memory-map the file, see :func:`read_sn3_pascal_vincent_array`.
+            Default to True.
     Return:
-        :torch.Tensor: Tensor of label file from path.
+        :np.ndarray: int64 array of label file from path.
     """
-    with open(path, 'rb') as f:
-        x = read_sn3_pascal_vincent_tensor(f, strict=False)
-    assert (x.dtype == torch.uint8)
-    assert (x.ndimension() == 1)
+    x = read_sn3_pascal_vincent_array(path, strict=False, mmap=mmap)
+    assert (x.dtype == np.uint8)
+    assert (x.ndim == 1)
 
-    return x.long()
+    return x.astype(np.int64)
 
 
-def read_image_file(path):
+def read_image_file(path, mmap=True):
     """Read image file from path.
     Args:
         path (str, required): Path of image file.
+        mmap (bool, optional): Whether to memory-map the file, see :func:`read_sn3_pascal_vincent_array`.
+            Default to True.
     Return:
-        :torch.Tensor: Tensor of image file from path.
+        :np.ndarray: uint8 array of image file from path, memory-mapped by default.
     """
-    with open(path, 'rb') as f:
-        x = read_sn3_pascal_vincent_tensor(f, strict=False)
-        assert (x.dtype == torch.uint8)
-        assert (x.ndimension() == 3)
+    x = read_sn3_pascal_vincent_array(path, strict=False, mmap=mmap)
+    assert (x.dtype == np.uint8)
+    assert (x.ndim == 3)
 
     return x
 
@@ -104,6 +156,11 @@ class MNIST(BaseDataset):
     """`MNIST <http://yann.lecun.com/exdb/mnist/>`_ Dataset.
     This implementation is modified from
     https://github.com/pytorch/vision/blob/master/torchvision/datasets/mnist.py
+    Args:
+        shared_memory (bool, optional): Whether one process per node loads the split into POSIX shared
+            memory, which all ranks and DataLoader workers of the node attach to. Default to False.
+        from_archive (bool, optional): Whether to decompress the downloaded '.gz' files straight into memory
+            instead of decoding them into raw files next to them. Default to False.
     """
 
     resource_prefix = 'http://yann.lecun.com/exdb/mnist/'
@@ -123,22 +180,22 @@ class MNIST(BaseDataset):
         '6 - six', '7 - seven', '8 - eight', '9 - nine'
     ]
 
+    def __init__(self, *args, shared_memory=False, from_archive=False, **kwargs):
+        self.shared_memory = shared_memory
+        self.from_archive = from_archive
+        super(MNIST, self).__init__(*args, **kwargs)
+
     def load_annotations(self):
-        train_image_file = osp.join(
-            self.data_path_prefix, rm_suffix(self.resources['train_image_file'][0])
-        )
-        train_label_file = osp.join(
-            self.data_path_prefix, rm_suffix(self.resources['train_label_file'][0])
-        )
-        test_image_file = osp.join(
-            self.data_path_prefix, rm_suffix(self.resources['test_image_file'][0])
-        )
-        test_label_file = osp.join(
-            self.data_path_prefix, rm_suffix(self.resources['test_label_file'][0])
-        )
+        # only the split asked by test_mode is read
+        split = 'test' if self.test_mode else 'train'
+        image_file = osp.join(self.data_path_prefix, self.resources[f'{split}_image_file'][0])
+        label_file = osp.join(self.data_path_prefix, self.resources[f'{split}_label_file'][0])
+
+        def available(file_path):
+            # the decoded file or the downloaded archive
+            return osp.exists(rm_suffix(file_path)) or osp.exists(file_path)
 
-        if not osp.exists(train_image_file) or not osp.exists(train_label_file) or not osp.exists(
-                test_image_file) or not osp.exists(test_label_file):
+        if not available(image_file) or not available(label_file):
             self.download()
 
         # get process number and total number of processes
@@ -146,41 +203,48 @@ class MNIST(BaseDataset):
         # multi-processes
         if world_size > 1:
             dist.barrier()
-            assert osp.exists(train_image_file) and osp.exists(
-                train_label_file) and osp.exists(
-                test_image_file) and osp.exists(test_label_file), \
+            assert available(image_file) and available(label_file), \
                 'Shared storage seems unavailable. Please download dataset ' \
                 f'manually through {self.resource_prefix}.'
 
-        train_set = (read_image_file(train_image_file), read_label_file(train_label_file))
-        test_set = (read_image_file(test_image_file), read_label_file(test_label_file))
+        if osp.exists(rm_suffix(image_file)):
+            image_file = rm_suffix(image_file)
+        if osp.exists(rm_suffix(label_file)):
+            label_file = rm_suffix(label_file)
 
-        if not self.test_mode:
-            images, gt_labels = train_set
-        else:
-            images, gt_labels = test_set
+        def mmap(file_path):
+            # raw files are memory-mapped, archives are only decoded to disk outside of the archive mode
+            return not self.from_archive or not file_path.endswith(('.gz', '.xz'))
 
-        data_infos = []
-        for img, gt_label in zip(images, gt_labels):
-            gt_label = np.array(gt_label, dtype=np.int64)
-            info = {'img': img.numpy(), 'gt_label': gt_label}
-            data_infos.append(info)
+        def load_split():
+            return {
+                'imgs': read_image_file(image_file, mmap=mmap(image_file)),
+                'gt_labels': read_label_file(label_file, mmap=mmap(label_file))
+            }, {}
 
-        return data_infos
+        if not self.shared_memory:
+            arrays, _ = load_split()
+            return SampleTable(arrays['gt_labels'], imgs=arrays['imgs'])
+
+        key = f'{type(self).__name__}:{osp.abspath(self.data_path_prefix)}:{split}'
+        arrays, _ = share_arrays_on_node(key, load_split)
+
+        return SampleTable(arrays['gt_labels'], imgs=arrays['imgs'])
 
     @master_only
     def download(self):
         os.makedirs(self.data_path_prefix, exist_ok=True)
 
-        # download files
-        for url, md5 in self.resources.values():
-            url = osp.join(self.resource_prefix, url)
-            filename = url.rpartition('/')[2]
-            download_and_extract_archive(
-                url,
-                download_root=self.data_path_prefix,
-                filename=filename,
-                md5=md5)
+        # download all files concurrently
+        archives = download_urls(
+            [(osp.join(self.resource_prefix, filename), filename, md5) for filename, md5 in self.resources.values()],
+            root=self.data_path_prefix,
+            # archives unchanged since their md5 was verified are not hashed again
+            verify='fast'
+        )
+        if not self.from_archive:
+            for archive in archives:
+                extract_archive(archive, self.data_path_prefix)
 
 
 @DATASETS.register_module()
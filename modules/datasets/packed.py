@@ -0,0 +1,188 @@
+import os
+import os.path as osp
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mmcv import FileClient
+from mmcv.utils import build_from_cfg
+from .base_dataset import BaseDataset
+from .builder import DATASETS
+from .index_cache import dump_arrays, load_arrays
+from .sample_table import SampleTable
+from ..utlis import get_root_logger
+
+__all__ = ['pack_dataset', 'PackedDataset']
+
+INDEX_FILE = 'index.idx'
+
+
+def pack_dataset(dataset, out_dir, shard_size=1024 * 1024 * 1024, num_threads=8, window=256):
+    """Pack the encoded images of a file based dataset into large shard files.
+    The raw bytes of every sample are concatenated in the order of the dataset into ``shard-XXXXX.bin``
+    files of about ``shard_size`` bytes, and an index with the shard, offset, length, label and original
+    path of every sample is written last, so an interrupted conversion leaves no usable index.
+    Args:
+        dataset (BaseDataset | dict, required): The dataset, or its config, e.g. a ``CustomDataset`` or
+            ``CUB`` config. The pipeline of a config is not built.
+        out_dir (str, required): Directory of the shards and of the index.
+        shard_size (int, optional): Number of bytes from which a new shard is started. Default to 1GB.
+        num_threads (int, optional): Number of threads reading the source files. Default to 8.
+        window (int, optional): Number of files read ahead of the writer. Default to 256.
+    Return:
+        :str: Path of the index file.
+    """
+    if isinstance(dataset, dict):
+        dataset = build_from_cfg(dict(dataset, pipeline=[]), DATASETS)
+    table = dataset.data_infos
+    if table.filenames is None:
+        raise TypeError(f'{type(dataset).__name__} holds its images in memory, only file based datasets '
+                        'can be packed.')
+
+    logger = get_root_logger()
+    file_client = FileClient.infer_client(getattr(dataset, 'file_client_args', None), table.img_prefix)
+    os.makedirs(out_dir, exist_ok=True)
+
+    def read(idx):
+        filename = table.filenames[idx]
+        if table.img_prefix is not None:
+            filename = osp.join(table.img_prefix, filename)
+        return file_client.get(filename)
+
+    num_samples = len(table)
+    shard_ids = np.zeros(num_samples, dtype=np.int64)
+    offsets = np.zeros(num_samples, dtype=np.int64)
+    lengths = np.zeros(num_samples, dtype=np.int64)
+    shards, shard, position = [], None, 0
+    with ThreadPoolExecutor(num_threads) as executor:
+        for start in range(0, num_samples, window):
+            indices = range(start, min(start + window, num_samples))
+            # the files of a window are read concurrently and written in order
+            for idx, data in zip(indices, executor.map(read, indices)):
+                if shard is None or position >= shard_size:
+                    if shard is not None:
+                        shard.close()
+                        logger.info(f'packed {idx}/{num_samples} samples into {len(shards)} shards')
+                    shards.append(f'shard-{len(shards):05d}.bin')
+                    shard, position = open(osp.join(out_dir, shards[-1]), 'wb'), 0
+                shard.write(data)
+                shard_ids[idx], offsets[idx], lengths[idx] = len(shards) - 1, position, len(data)
+                position += len(data)
+    if shard is not None:
+        shard.close()
+    logger.info(f'packed {num_samples} samples into {len(shards)} shards under {out_dir}')
+
+    arrays = table.to_arrays()
+    arrays.update(shard_ids=shard_ids, offsets=offsets, lengths=lengths)
+    meta = {
+        'shards': shards,
+        'classes': None if dataset.CLASSES is None else list(dataset.CLASSES),
+        'img_prefix': table.img_prefix
+    }
+    index_file = osp.join(out_dir, INDEX_FILE)
+    dump_arrays(index_file, arrays, meta)
+
+    return index_file
+
+
+@DATASETS.register_module()
+class PackedDataset(BaseDataset):
+    """Dataset reading the shards written by :func:`pack_dataset`.
+    Every sample is read by one ``os.pread`` at its offset, so loading does not open a file per image and
+    consecutive samples of the dataset are contiguous on disk. The encoded image is passed to the pipeline
+    as ``img_bytes``, with the original ``img_prefix`` and ``img_info`` kept for reference.
+    Args:
+        data_path_prefix (str, required): Directory of the shards and of the index.
+        pipeline (Sequence[dict], optional): A list of dict, where each element represents
+            a operation defined in `datasets.pipelines`. Defaults to an empty tuple.
+        classes (str | Sequence[str], optional): Specify names of classes. If is None, use the classes of
+            the packed dataset. Defaults to None.
+        test_mode (bool, optional): In train mode or test mode. Defaults to False.
+        max_open_files (int, optional): Number of shards kept open by every process, the least recently
+            read one is closed beyond it. Defaults to 64.
+    """
+
+    def __init__(self, data_path_prefix, pipeline=(), classes=None, test_mode=False, max_open_files=64):
+        self.max_open_files = max_open_files
+        self._files = OrderedDict()
+
+        super().__init__(
+            data_path_prefix=data_path_prefix,
+            pipeline=pipeline,
+            classes=classes,
+            test_mode=test_mode
+        )
+
+    def load_annotations(self):
+        """Load the memory-mapped index of the shards.
+        """
+        arrays, meta = load_arrays(osp.join(self.data_path_prefix, INDEX_FILE))
+        self.shards = meta['shards']
+        self.shard_ids = arrays.pop('shard_ids')
+        self.offsets = arrays.pop('offsets')
+        self.lengths = arrays.pop('lengths')
+        if self.CLASSES is None:
+            self.CLASSES = meta['classes']
+
+        return SampleTable.from_arrays(arrays, img_prefix=meta['img_prefix'])
+
+    def _get_file(self, shard_id):
+        """Get the descriptor of a shard, opening it if needed.
+        Args:
+            shard_id (int, required): Index of the shard.
+        Return:
+            :int: The file descriptor.
+        """
+        fd = self._files.get(shard_id)
+        if fd is None:
+            if len(self._files) >= self.max_open_files:
+                os.close(self._files.popitem(last=False)[1])
+            fd = os.open(osp.join(self.data_path_prefix, self.shards[shard_id]), os.O_RDONLY)
+            self._files[shard_id] = fd
+        else:
+            self._files.move_to_end(shard_id)
+
+        return fd
+
+    def read_bytes(self, idx):
+        """Read the encoded image of a sample.
+        Args:
+            idx (int, required): Index of data.
+        Return:
+            :bytes: The content of the original image file.
+        """
+        length, offset = int(self.lengths[idx]), int(self.offsets[idx])
+        # pread does not move a shared file position, so forked DataLoader workers can reuse the descriptors
+        data = os.pread(self._get_file(int(self.shard_ids[idx])), length, offset)
+        if len(data) != length:
+            raise IOError(f'Truncated read of sample {idx} in {self.shards[int(self.shard_ids[idx])]}.')
+
+        return data
+
+    def get_data_info(self, idx):
+        """Get the information dict of one sample with its encoded image.
+        Args:
+            idx (int, required): Index of data.
+        Return:
+            :dict: Information of the sample and its ``img_bytes``.
+        """
+        info = super().get_data_info(idx)
+        info['img_bytes'] = self.read_bytes(idx)
+
+        return info
+
+    def close(self):
+        """Close the opened shards.
+        """
+        while self._files:
+            os.close(self._files.popitem()[1])
+
+    def __getstate__(self):
+        # descriptors are not valid in a spawned process, which opens its own
+        state = self.__dict__.copy()
+        state['_files'] = OrderedDict()
+
+        return state
+
+    def __del__(self):
+        if getattr(self, '_files', None):
+            self.close()
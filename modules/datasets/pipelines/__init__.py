@@ -1,3 +1,12 @@
+from .cache import PrefixCache
 from .compose import Compose
+from .formatting import Collect, ImageToTensor, ToTensor, to_tensor
+from .loading import LoadImageFromFile
+from .profiler import PipelineProfiler
+from .results import Results
+from .transforms import CenterCrop, Normalize, RandomCrop, RandomFlip, Resize
 
-__all__ = ['Compose']
+__all__ = [
+    'Compose', 'PipelineProfiler', 'PrefixCache', 'Results', 'Resize', 'CenterCrop', 'RandomCrop', 'RandomFlip',
+    'Normalize', 'to_tensor', 'ToTensor', 'ImageToTensor', 'Collect', 'LoadImageFromFile'
+]
@@ -0,0 +1,112 @@
+import atexit
+import os
+import os.path as osp
+import pickle
+import shutil
+import socket
+from ..bytes_cache import SharedBytesCache
+from ..shared_memory import get_local_dist_info
+from .results import Results
+
+__all__ = ['PrefixCache']
+
+
+class PrefixCache(object):
+    """Cache of the output of the deterministic prefix of a :class:`Compose` pipeline, per sample, shared by
+    all ranks and DataLoader workers of a node.
+    Entries are pickled into a :class:`SharedBytesCache` of ``max_bytes``, so a sample computed by one worker
+    is a hit in all the others, whatever worker the sampler sends it to in the next epoch, and the node holds
+    a single copy of it. Entries hit before their eviction move back to the head of the ring, approximating
+    least recently used eviction. Every hit unpickles new values, arrays, tensors and nested dicts included,
+    which belong to the returned :class:`Results` only, so the random transforms following the prefix modify
+    them in place and never alter the cache.
+
+    With ``spill_dir``, every entry is also written to a directory of the run under ``spill_dir`` and loaded
+    back once the ring has evicted it. The directory is removed when the process which created the cache
+    exits, entries are never read by another run or another cache.
+    Args:
+        num_keys (int, required): Number of keys, which are integers in ``[0, num_keys)``.
+        max_bytes (int, optional): Memory budget in bytes. Default to 1GB.
+        spill_dir (str | None, optional): Root of the spill directories, no spill if None. Default to None.
+        key (str, optional): Identity of the cached data, e.g. dataset type, path and split.
+            Default to 'prefix'.
+    """
+
+    def __init__(self, num_keys, max_bytes=1 << 30, spill_dir=None, key='prefix'):
+        self.max_bytes = max_bytes
+        self.store = SharedBytesCache(num_keys, max_bytes=max_bytes, key=key, lru=True)
+        self.spill_dir = None
+        if spill_dir is not None:
+            # the host keeps apart the nodes sharing a file system, the keys of the store are the same
+            self.spill_dir = osp.join(spill_dir, f'{self.store.prefix}_{socket.gethostname()}')
+            os.makedirs(self.spill_dir, exist_ok=True)
+            local_rank, _ = get_local_dist_info()
+            if local_rank == 0:
+                atexit.register(self._remove_spill_dir, os.getpid())
+        # spilled entries loaded back by this process
+        self.spill_hits = 0
+
+    def _remove_spill_dir(self, creator):
+        # forked DataLoader workers inherit the handler but must not remove the directory
+        if os.getpid() == creator:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def _spill_path(self, key):
+        return osp.join(self.spill_dir, f'{key}.pkl')
+
+    def _spill(self, key, data):
+        # written aside and renamed, other processes never load a partial entry
+        path = self._spill_path(key)
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _load(data):
+        values = pickle.loads(data)
+        results = Results(values)
+        # the unpickled values are not shared with anything
+        results._owned.update(values)
+
+        return results
+
+    def get(self, key):
+        """Get the cached output of the prefix.
+        Args:
+            key (int, required): Key of the sample, e.g. its index.
+        Return:
+            :Results | None: New copy of the cached output, None on a miss.
+        """
+        data = self.store.get(key)
+        if data is None and self.spill_dir is not None:
+            try:
+                with open(self._spill_path(key), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.spill_hits += 1
+                self.store.put(key, data)
+
+        return None if data is None else self._load(data)
+
+    def put(self, key, data):
+        """Cache the output of the prefix.
+        Args:
+            key (int, required): Key of the sample, e.g. its index.
+            data (dict, required): Output of the prefix, which is not modified.
+        """
+        data = pickle.dumps(dict(data), protocol=pickle.HIGHEST_PROTOCOL)
+        self.store.put(key, data)
+        if self.spill_dir is not None:
+            self._spill(key, data)
+
+    def counters(self):
+        """Get the counters of the memory of the node.
+
+        Return:
+            :dict: Number of hits, misses and inserts, and the number of bytes written, see
+                :meth:`SharedBytesCache.counters`.
+        """
+        return self.store.counters()
@@ -1,6 +1,9 @@
+import time
 from collections.abc import Sequence
 from mmcv.utils import build_from_cfg
 from ..builder import PIPELINES
+from .cache import PrefixCache
+from .profiler import PipelineProfiler
 
 
 @PIPELINES.register_module()
@@ -8,9 +11,18 @@ class Compose(object):
     """Compose a data pipeline with a sequence of transforms.
     Args:
         transforms (list[dict | callable], required): Either config dicts of transforms or transform objects.
+        profile (bool | dict | None, optional): Whether to record per-transform statistics with a
+            :class:`PipelineProfiler`, a dict being its arguments, e.g. ``dict(interval=60, out_file=...)``.
+            Default to None, the transforms run without any instrumentation.
+        cache (bool | dict | None, optional): Whether to cache the output of the longest prefix of transforms
+            declaring ``deterministic = True`` per sample with a :class:`PrefixCache`, a dict being its
+            arguments, e.g. ``dict(max_bytes=4 << 30, spill_dir=...)``. The cache is shared by the node and
+            created by :meth:`build_cache`, which datasets call once their samples are loaded. Only the
+            samples given with a ``cache_key`` are cached, later epochs then only run the remaining
+            transforms. Default to None.
     """
 
-    def __init__(self, transforms):
+    def __init__(self, transforms, profile=None, cache=None):
         assert isinstance(transforms, Sequence)
         # init transforms to list
         self.transforms = []
@@ -26,20 +38,145 @@ class Compose(object):
             else:
                 raise TypeError(f'transform must be callable or a dict, but got {type(transform)}')
 
-    def __call__(self, data):
+        self.profiler = None
+        if profile:
+            self.profiler = PipelineProfiler(
+                [type(trans).__name__ for trans in self.transforms], **(profile if isinstance(profile, dict) else {}))
+
+        # length of the deterministic prefix, whose output does not change between epochs
+        self.num_deterministic = 0
+        for trans in self.transforms:
+            if not getattr(trans, 'deterministic', False):
+                break
+            self.num_deterministic += 1
+
+        self.cache_cfg = None
+        if cache and self.num_deterministic:
+            self.cache_cfg = dict(cache) if isinstance(cache, dict) else {}
+        self.cache = None
+
+    def build_cache(self, num_keys, key='prefix'):
+        """Create the prefix cache of the node, if enabled. It must be called by all ranks.
+        Args:
+            num_keys (int, required): Number of keys, which are integers in ``[0, num_keys)``.
+            key (str, optional): Identity of the cached data, e.g. dataset type, path and split.
+                Default to 'prefix'.
+        """
+        if self.cache_cfg is not None:
+            # the transforms are part of the identity of the cached outputs
+            prefix = '\n'.join(repr(trans) for trans in self.transforms[:self.num_deterministic])
+            self.cache = PrefixCache(num_keys, key=f'{key}:{prefix}', **self.cache_cfg)
+
+    def __call__(self, data, cache_key=None):
         """Parse transforms with input data.
         Args:
-            data (list[dict | callable], required): Either config dicts of transforms or transform objects.
+            data (dict | callable, required): A sample, or a function returning it, which is only called on a
+                miss of the prefix cache, e.g. to skip reading the file of a cached sample.
+            cache_key (int | None, optional): Key of the sample in the prefix cache, e.g. its index.
+                Default to None, the whole pipeline runs.
         Return:
             data: Data after transforms operations.
         """
+        if self.cache is not None and cache_key is not None:
+            return self._call_cached(data, cache_key)
+        if callable(data):
+            data = data()
+        if self.profiler is not None:
+            return self._profile(data)
+
+        for trans in self.transforms:
+            data = trans(data)
+            if data is None:
+                return None
+
+        return data
+
+    @property
+    def supports_batch(self):
+        """Whether every transform provides a ``batch`` method working on stacked samples.
+
+        Return:
+            :bool: True if the pipeline can run on a whole batch.
+        """
+        return all(callable(getattr(trans, 'batch', None)) for trans in self.transforms)
+
+    def batch(self, data):
+        """Parse the batch mode of transforms with a batch of stacked samples.
+        Args:
+            data (dict, required): Stacked samples, e.g. ``img`` with shape N x H x W x C and ``gt_label`` with shape N.
+        Return:
+            data: Batch after transforms operations.
+        """
+        if self.profiler is not None:
+            return self._profile(data, batch=True)
+
         for trans in self.transforms:
+            data = trans.batch(data)
+            if data is None:
+                return None
+
+        return data
+
+    def _call_cached(self, data, cache_key):
+        """Run the transforms, taking the output of the deterministic prefix from the cache when possible.
+        Args:
+            data (dict | callable, required): A sample, or a function returning it.
+            cache_key (int, required): Key of the sample in the prefix cache.
+        Return:
+            data: Data after transforms operations.
+        """
+        prefix = self.num_deterministic
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            cached = self._run(data() if callable(data) else data, 0, prefix)
+            if cached is None:
+                return None
+            self.cache.put(cache_key, cached)
+
+        return self._run(cached, prefix, len(self.transforms))
+
+    def _run(self, data, start, stop):
+        """Run a slice of the transforms on a sample.
+        Args:
+            data (dict, required): A sample.
+            start (int, required): Index of the first transform.
+            stop (int, required): Index after the last transform.
+        Return:
+            data: Data after transforms operations.
+        """
+        if self.profiler is not None:
+            return self._profile(data, start, stop)
+
+        for trans in self.transforms[start:stop]:
             data = trans(data)
             if data is None:
                 return None
 
         return data
 
+    def _profile(self, data, start=0, stop=None, batch=False):
+        """Run the transforms, recording the time and output size of each with the profiler.
+        Args:
+            data (dict, required): A sample, or stacked samples if ``batch``.
+            start (int, optional): Index of the first transform. Default to 0.
+            stop (int | None, optional): Index after the last transform, None for all. Default to None.
+            batch (bool, optional): Whether to run the batch mode of transforms. Default to False.
+        Return:
+            data: Data after transforms operations.
+        """
+        profiler = self.profiler
+        profiler.start()
+        stop = len(self.transforms) if stop is None else stop
+        for i in range(start, stop):
+            tic = time.perf_counter()
+            data = self.transforms[i].batch(data) if batch else self.transforms[i](data)
+            profiler.record(i, time.perf_counter() - tic, data)
+            if data is None:
+                break
+        profiler.stop()
+
+        return data
+
     def __repr__(self):
         """Print information of this class.
 
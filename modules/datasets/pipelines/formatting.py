@@ -0,0 +1,118 @@
+from collections.abc import Sequence
+import numpy as np
+import torch
+from ..builder import PIPELINES
+
+__all__ = ['to_tensor', 'ToTensor', 'ImageToTensor', 'Collect']
+
+
+def to_tensor(data):
+    """Convert objects of various python types to :obj:`torch.Tensor`.
+    Supported types are: :class:`numpy.ndarray`, :class:`torch.Tensor`, :class:`Sequence`, :class:`int` and
+    :class:`float`. Arrays with negative strides, e.g. flipped views, are made contiguous first, and read-only
+    arrays, e.g. shared with the sample table, are copied so the tensor never writes into them.
+    Args:
+        data (np.ndarray | torch.Tensor | Sequence | int | float, required): Data to be converted.
+    Return:
+        :torch.Tensor: The converted tensor.
+    """
+    if isinstance(data, torch.Tensor):
+        return data
+    if isinstance(data, np.ndarray):
+        if not data.flags.writeable:
+            data = np.array(data)
+        elif any(stride < 0 for stride in data.strides):
+            data = np.ascontiguousarray(data)
+        return torch.from_numpy(data)
+    if isinstance(data, Sequence) and not isinstance(data, str):
+        return torch.tensor(data)
+    if isinstance(data, int):
+        return torch.LongTensor([data])
+    if isinstance(data, float):
+        return torch.FloatTensor([data])
+
+    raise TypeError(f'Type {type(data)} cannot be converted to tensor.')
+
+
+@PIPELINES.register_module()
+class ToTensor(object):
+    """Convert fields to :obj:`torch.Tensor`.
+    Args:
+        keys (Sequence[str], required): Keys of the fields.
+    """
+
+    deterministic = True
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __call__(self, results):
+        for key in self.keys:
+            results[key] = to_tensor(results[key])
+
+        return results
+
+    def batch(self, results):
+        return self(results)
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(keys={self.keys})'
+
+
+@PIPELINES.register_module()
+class ImageToTensor(object):
+    """Convert images from H x W x C to C x H x W tensors, or N x H x W x C blocks to N x C x H x W.
+    The axes are permuted as a strided view, the pixels are only copied when the tensor is made contiguous,
+    e.g. when collated.
+    Args:
+        keys (Sequence[str], optional): Keys of the images. Default to ('img', ).
+    """
+
+    deterministic = True
+
+    def __init__(self, keys=('img', )):
+        self.keys = keys
+
+    def _convert(self, results, ndim):
+        for key in self.keys:
+            img = results[key]
+            if img.ndim < ndim:
+                img = np.expand_dims(img, -1)
+            results[key] = to_tensor(img).permute(*range(ndim - 3), ndim - 1, ndim - 3, ndim - 2)
+
+        return results
+
+    def __call__(self, results):
+        return self._convert(results, 3)
+
+    def batch(self, results):
+        return self._convert(results, 4)
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(keys={self.keys})'
+
+
+@PIPELINES.register_module()
+class Collect(object):
+    """Keep only the given fields.
+    Args:
+        keys (Sequence[str], required): Keys of the fields to be kept.
+    """
+
+    deterministic = True
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __call__(self, results):
+        # delete in place, so the container and its copy-on-write bookkeeping are kept
+        for key in [key for key in results if key not in self.keys]:
+            del results[key]
+
+        return results
+
+    def batch(self, results):
+        return self(results)
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(keys={self.keys})'
@@ -0,0 +1,181 @@
+import io
+import os.path as osp
+import cv2
+import mmcv
+import numpy as np
+from PIL import Image
+from ..builder import PIPELINES
+
+__all__ = ['LoadImageFromFile']
+
+# decoding flags of cv2 per reduction factor, the EXIF orientation is ignored like by the pillow backend
+cv2_decode_flags = {
+    'color': {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8
+    },
+    'grayscale': {
+        1: cv2.IMREAD_GRAYSCALE,
+        2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+    }
+}
+
+
+def jpeg_size(img_bytes):
+    """Read the size of a JPEG image from the header of its frame, without decoding it.
+    Args:
+        img_bytes (bytes, required): The encoded image.
+    Return:
+        :tuple[int, int] | None: (h, w) of the image, None if it is not a JPEG.
+    """
+    if img_bytes[:2] != b'\xff\xd8':
+        return None
+    pos, size = 2, len(img_bytes)
+    while pos + 9 <= size:
+        if img_bytes[pos] != 0xFF:
+            return None
+        marker = img_bytes[pos + 1]
+        if marker == 0xFF:
+            # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # markers without payload
+            pos += 2
+            continue
+        # start of frame markers, except DHT, JPG and DAC
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(img_bytes[pos + 5:pos + 7], 'big'), int.from_bytes(img_bytes[pos + 7:pos + 9], 'big')
+        pos += 2 + int.from_bytes(img_bytes[pos + 2:pos + 4], 'big')
+
+    return None
+
+
+@PIPELINES.register_module()
+class LoadImageFromFile(object):
+    """Load an image from file, or from the ``img_bytes`` of a :class:`PackedDataset` sample.
+    Given the ``target_size`` of the following resize, JPEG images are decoded at the largest reduction
+    among 1/2, 1/4 and 1/8 which keeps them at least as large as the target, through the DCT scaling of
+    libjpeg: ``IMREAD_REDUCED_*`` for cv2 and ``Image.draft`` for pillow. Only the reduced image is ever
+    allocated, so decoding a 12MP photo for a 224 input takes a fraction of the time and memory of a full
+    decode. Other formats are decoded at full size.
+    Required keys are ``img_prefix`` and ``img_info`` (a dict that must contain the key ``filename``), or
+    ``img_bytes``. Added or updated keys are ``filename``, ``ori_filename``, ``img``, ``img_shape``,
+    ``ori_shape`` (the size before the reduction) and ``decode_scale`` (the reduction factor).
+    Args:
+        target_size (int | tuple[int, int] | None, optional): Minimum size of the decoded image (h, w), like
+            ``size`` of :class:`Resize`: an int for a square, or -1 as w to only bound the short side by h.
+            Default to None, full resolution.
+        backend (str, optional): Decoding backend, 'cv2' or 'pillow'. Default to 'cv2'.
+        color_type (str, optional): 'color' for H x W x 3 images, 'grayscale' for H x W. Default to 'color'.
+        channel_order (str, optional): Order of the channels of color images, 'bgr' or 'rgb'.
+            Default to 'bgr'.
+        to_float32 (bool, optional): Whether to convert the uint8 image to float32. Default to False.
+        file_client_args (dict, optional): Arguments to instantiate a FileClient, see :class:`mmcv.FileClient`.
+            Default to ``dict(backend='disk')``.
+    """
+
+    deterministic = True
+
+    def __init__(self,
+                 target_size=None,
+                 backend='cv2',
+                 color_type='color',
+                 channel_order='bgr',
+                 to_float32=False,
+                 file_client_args=dict(backend='disk')):
+        if isinstance(target_size, int):
+            target_size = (target_size, target_size)
+        assert target_size is None or (isinstance(target_size, tuple) and len(target_size) == 2), \
+            f'target_size should be None, an int or a tuple (h, w), but got {target_size}'
+        assert backend in ['cv2', 'pillow'], f'Unsupported backend {backend}'
+        assert color_type in ['color', 'grayscale'], f'Unsupported color_type {color_type}'
+        assert channel_order in ['bgr', 'rgb'], f'Unsupported channel_order {channel_order}'
+        self.target_size = target_size
+        self.backend = backend
+        self.color_type = color_type
+        self.channel_order = channel_order
+        self.to_float32 = to_float32
+        self.file_client_args = file_client_args.copy()
+        self.file_client = None
+
+    def decode_scale(self, height, width):
+        """Get the reduction factor of an image.
+        Args:
+            height (int, required): Height of the encoded image.
+            width (int, required): Width of the encoded image.
+        Return:
+            :int: The largest factor among 8, 4 and 2 keeping the decoded image at least as large as
+                ``target_size``, 1 if none does.
+        """
+        if self.target_size is None:
+            return 1
+        target_h, target_w = self.target_size
+        for scale in (8, 4, 2):
+            # libjpeg rounds the reduced size up
+            h, w = -(-height // scale), -(-width // scale)
+            if (min(h, w) >= target_h) if target_w == -1 else (h >= target_h and w >= target_w):
+                return scale
+
+        return 1
+
+    def _decode_cv2(self, img_bytes):
+        size = jpeg_size(img_bytes)
+        scale = 1 if size is None else self.decode_scale(*size)
+        flag = cv2_decode_flags[self.color_type][scale] | cv2.IMREAD_IGNORE_ORIENTATION
+        img = cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), flag)
+        if img is None:
+            raise ValueError('Failed to decode the image.')
+        if self.color_type == 'color' and self.channel_order == 'rgb':
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+        return img, (size or img.shape[:2]), scale
+
+    def _decode_pillow(self, img_bytes):
+        img = Image.open(io.BytesIO(img_bytes))
+        width, height = img.size
+        mode = 'RGB' if self.color_type == 'color' else 'L'
+        scale = self.decode_scale(height, width)
+        if scale > 1 and img.draft(mode, (width // scale, height // scale)) is None:
+            # not a JPEG, no reduced decoding
+            scale = 1
+        img = np.array(img.convert(mode))
+        if self.color_type == 'color' and self.channel_order == 'bgr':
+            cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+
+        return img, (height, width), scale
+
+    def __call__(self, results):
+        img_bytes = results.pop('img_bytes', None)
+        filename = results['img_info']['filename']
+        if results.get('img_prefix') is not None:
+            filename = osp.join(results['img_prefix'], filename)
+        if img_bytes is None:
+            if self.file_client is None:
+                self.file_client = mmcv.FileClient(**self.file_client_args)
+            img_bytes = self.file_client.get(filename)
+
+        if self.backend == 'cv2':
+            img, ori_size, scale = self._decode_cv2(img_bytes)
+        else:
+            img, ori_size, scale = self._decode_pillow(img_bytes)
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        results['filename'] = filename
+        results['ori_filename'] = results['img_info']['filename']
+        results['img'] = img
+        results['img_shape'] = img.shape
+        results['ori_shape'] = tuple(ori_size) + img.shape[2:]
+        results['decode_scale'] = scale
+
+        return results
+
+    def __repr__(self):
+        return (self.__class__.__name__ + f'(target_size={self.target_size}, backend={self.backend}, '
+                f'color_type={self.color_type}, channel_order={self.channel_order}, '
+                f'to_float32={self.to_float32}, file_client_args={self.file_client_args})')
@@ -0,0 +1,184 @@
+import json
+import os
+import os.path as osp
+import time
+from collections.abc import Mapping
+import numpy as np
+import torch
+from torch.utils.data import get_worker_info
+from ...utlis import get_root_logger
+
+__all__ = ['PipelineProfiler']
+
+NUM_BUCKETS = 48
+# columns of the statistics of one transform
+CALLS, TIME, BYTES = 0, 1, 2
+TIME_HIST = 3
+SIZE_HIST = TIME_HIST + NUM_BUCKETS
+NUM_COLUMNS = SIZE_HIST + NUM_BUCKETS
+
+
+def _bucket(value):
+    """Get the histogram bucket of a value, bucket k holding the values in [2 ** (k - 1), 2 ** k).
+    Args:
+        value (float, required): Non-negative value, in microseconds or bytes.
+    Return:
+        :int: Index of the bucket.
+    """
+    return min(int(value).bit_length(), NUM_BUCKETS - 1)
+
+
+def _nbytes(data):
+    """Get the size of the arrays and tensors of the output of a transform.
+    Args:
+        data (dict | obj, required): Output of a transform.
+    Return:
+        :int: Number of bytes.
+    """
+    if isinstance(data, Mapping):
+        return sum(getattr(value, 'nbytes', 0) for value in data.values())
+
+    return getattr(data, 'nbytes', 0)
+
+
+def _percentile(hist, q):
+    """Get the upper bound of the bucket holding a percentile.
+    Args:
+        hist (np.ndarray, required): Counts of the power-of-two buckets.
+        q (float, required): Percentile in [0, 1].
+    Return:
+        :float: Upper bound of the bucket, 0 for an empty histogram.
+    """
+    total = hist.sum()
+    if total == 0:
+        return 0.
+
+    return float(2 ** int(np.searchsorted(np.cumsum(hist), q * total)))
+
+
+class PipelineProfiler(object):
+    """Per-transform statistics of a :class:`Compose` pipeline.
+    For every transform, the number of calls, the wall time and the bytes of arrays in the output are
+    accumulated, along with power-of-two histograms of the time and of the output size. The statistics are
+    kept in shared memory with one row per process: the main process and every DataLoader worker only
+    write their own row, so no lock is needed, and any process, e.g. the training loop, can read the sum
+    over all rows with :meth:`summary` or :meth:`dump`. The first worker, or the main process when it runs
+    the pipeline itself, dumps the summary every ``interval`` seconds.
+    Args:
+        names (Sequence[str], required): Names of the transforms.
+        interval (float, optional): Seconds between two periodic dumps, no periodic dump if None.
+            Default to 60.
+        out_file (str | None, optional): JSON file the summary is written to, besides the `qcls` logger.
+            Default to None.
+        max_workers (int, optional): Maximum number of DataLoader workers. Default to 64.
+    """
+
+    def __init__(self, names, interval=60., out_file=None, max_workers=64):
+        self.names = list(names)
+        self.interval = interval
+        self.out_file = out_file
+        self.max_workers = max_workers
+        self.stats = torch.zeros((max_workers + 1, len(self.names), NUM_COLUMNS), dtype=torch.float64)
+        self.stats.share_memory_()
+        self._pid = None
+
+    def __getstate__(self):
+        # the shared tensor is sent by handle, the view on the row is rebuilt by the receiving process
+        state = self.__dict__.copy()
+        state['_pid'] = None
+        state.pop('_row', None)
+
+        return state
+
+    def _attach(self):
+        """Bind the process to its row, the first time it runs the pipeline."""
+        self._pid = os.getpid()
+        worker_info = get_worker_info()
+        index = 0 if worker_info is None else worker_info.id + 1
+        assert index <= self.max_workers, f'more than max_workers({self.max_workers}) DataLoader workers'
+        self._row = self.stats[index].numpy()
+        self._reporter = index <= 1
+        self._last_dump = time.perf_counter()
+
+    def start(self):
+        """Called before a run of the pipeline."""
+        if self._pid != os.getpid():
+            self._attach()
+
+    def record(self, index, seconds, data):
+        """Record one call of a transform.
+        Args:
+            index (int, required): Index of the transform.
+            seconds (float, required): Wall time of the call.
+            data (dict | obj, required): Output of the transform.
+        """
+        row = self._row[index]
+        nbytes = _nbytes(data)
+        row[CALLS] += 1
+        row[TIME] += seconds
+        row[BYTES] += nbytes
+        row[TIME_HIST + _bucket(seconds * 1e6)] += 1
+        row[SIZE_HIST + _bucket(nbytes)] += 1
+
+    def stop(self):
+        """Called after a run of the pipeline, dumps the summary when the interval is over."""
+        if self._reporter and self.interval is not None:
+            now = time.perf_counter()
+            if now - self._last_dump >= self.interval:
+                self._last_dump = now
+                self.dump()
+
+    def summary(self):
+        """Aggregate the statistics of all processes.
+
+        Return:
+            :dict: Number of processes which ran the pipeline and statistics of every transform, times in
+                seconds and sizes in bytes, histograms indexed by the upper bound of their buckets.
+        """
+        stats = self.stats.numpy()
+        workers = int(np.count_nonzero(stats[:, :, CALLS].sum(axis=1)))
+        stats = stats.sum(axis=0)
+        total_time = stats[:, TIME].sum()
+        transforms = []
+        for name, stat in zip(self.names, stats):
+            calls = int(stat[CALLS])
+            time_hist = stat[TIME_HIST:SIZE_HIST]
+            size_hist = stat[SIZE_HIST:]
+            transforms.append({
+                'name': name,
+                'calls': calls,
+                'total_time': float(stat[TIME]),
+                'time_share': float(stat[TIME] / total_time) if total_time else 0.,
+                'mean_time': float(stat[TIME] / calls) if calls else 0.,
+                'p50_time': _percentile(time_hist, 0.5) / 1e6,
+                'p95_time': _percentile(time_hist, 0.95) / 1e6,
+                'mean_bytes': float(stat[BYTES] / calls) if calls else 0.,
+                'time_hist': {2 ** k / 1e6: int(count) for k, count in enumerate(time_hist) if count},
+                'size_hist': {2 ** k: int(count) for k, count in enumerate(size_hist) if count}
+            })
+
+        return {'workers': workers, 'total_time': float(total_time), 'transforms': transforms}
+
+    def dump(self):
+        """Log the summary with the `qcls` logger and write it to ``out_file`` if given.
+
+        Return:
+            :dict: The summary.
+        """
+        summary = self.summary()
+        logger = get_root_logger()
+        logger.info(f'pipeline profile of {summary["workers"]} processes, {summary["total_time"]:.2f}s in total')
+        for i, stat in enumerate(summary['transforms']):
+            logger.info(f'  [{i}] {stat["name"]}: {stat["calls"]} calls, {stat["total_time"]:.2f}s '
+                        f'({stat["time_share"]:.1%}), mean {stat["mean_time"] * 1e3:.3f}ms, '
+                        f'p50 < {stat["p50_time"] * 1e3:.3f}ms, p95 < {stat["p95_time"] * 1e3:.3f}ms, '
+                        f'output {stat["mean_bytes"] / 1024:.1f}KB')
+        if self.out_file is not None:
+            # written aside and renamed, readers never see a partial file
+            tmp_file = f'{self.out_file}.tmp-{os.getpid()}'
+            os.makedirs(osp.dirname(osp.abspath(self.out_file)), exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                json.dump(summary, f, indent=2)
+            os.replace(tmp_file, self.out_file)
+
+        return summary
@@ -0,0 +1,73 @@
+import copy
+import numpy as np
+
+
+class Results(dict):
+    """Copy-on-write container of the data flowing through a pipeline.
+    The values are shared with the dataset instead of being deep copied for every sample. Arrays coming
+    from the dataset are read-only views, so modifying them in place raises instead of corrupting the
+    cached samples. A transform which wants to modify a field in place asks for a private copy with
+    :meth:`writable`, and fields replaced by assignment are never copied at all.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Results, self).__init__(*args, **kwargs)
+        # keys whose value belongs to this sample only and can be modified freely
+        self._owned = set()
+
+    def __setitem__(self, key, value):
+        super(Results, self).__setitem__(key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        super(Results, self).__delitem__(key)
+        self._owned.discard(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+
+        return self[key]
+
+    def pop(self, key, *args):
+        self._owned.discard(key)
+
+        return super(Results, self).pop(key, *args)
+
+    def __reduce__(self):
+        # the items are restored by the constructor, e.g. when DataLoader workers send samples back,
+        # instead of through __setitem__ before the ownership set exists
+        return self.__class__, (dict(self), ), {'_owned': set(self._owned)}
+
+    def writable(self, key):
+        """Get a value which can be modified in place, copying it on first request if it is shared.
+        Args:
+            key (str, required): The key of the field to be modified.
+        Return:
+            :obj: The private value stored under ``key``.
+        """
+        value = self[key]
+        if isinstance(value, np.ndarray):
+            if key not in self._owned or not value.flags.writeable:
+                value = np.array(value)
+        elif key not in self._owned:
+            value = copy.deepcopy(value)
+        self[key] = value
+
+        return value
+
+    def copy(self):
+        """Shallow copy sharing every value, after which neither container owns the shared values.
+
+        Return:
+            :Results: The copied container.
+        """
+        self._owned.clear()
+
+        return Results(self)
+
+    __copy__ = copy
@@ -0,0 +1,257 @@
+import cv2
+import mmcv
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ..builder import PIPELINES
+
+__all__ = ['Resize', 'CenterCrop', 'RandomCrop', 'RandomFlip', 'Normalize']
+
+cv2_interp_codes = {
+    'nearest': cv2.INTER_NEAREST,
+    'bilinear': cv2.INTER_LINEAR,
+    'bicubic': cv2.INTER_CUBIC,
+    'area': cv2.INTER_AREA,
+    'lanczos': cv2.INTER_LANCZOS4
+}
+
+
+def _target_size(size, height, width):
+    """Get the output size of :class:`Resize`.
+    Args:
+        size (tuple[int, int], required): Target (h, w), w being -1 to keep the aspect ratio with the short
+            side resized to h.
+        height (int, required): Height of the image.
+        width (int, required): Width of the image.
+    Return:
+        :tuple[int, int]: The output (h, w).
+    """
+    if size[1] != -1:
+        return size
+    short = size[0]
+    if height < width:
+        return short, int(short * width / height)
+
+    return int(short * height / width), short
+
+
+@PIPELINES.register_module()
+class Resize(object):
+    """Resize images.
+    The batch mode resizes every image of the N x H x W x C block straight into one preallocated output
+    block, without building a sample dict per image.
+    Args:
+        size (int | tuple[int, int], required): Images scales for resizing (h, w). When size is int, the image
+            is resized to (size, size). When the second value is -1, the short side is resized to the first
+            value and the aspect ratio is kept.
+        interpolation (str, optional): Interpolation method, one of 'nearest', 'bilinear', 'bicubic', 'area'
+            and 'lanczos'. Default to 'bilinear'.
+    """
+
+    deterministic = True
+
+    def __init__(self, size, interpolation='bilinear'):
+        if isinstance(size, int):
+            size = (size, size)
+        assert isinstance(size, tuple) and len(size) == 2 and size[0] > 0 and (size[1] > 0 or size[1] == -1), \
+            f'size should be an int or a tuple (h, w) with w positive or -1, but got {size}'
+        assert interpolation in cv2_interp_codes, f'Unsupported interpolation {interpolation}'
+        self.size = size
+        self.interpolation = interpolation
+
+    def __call__(self, results):
+        img = results['img']
+        h, w = _target_size(self.size, *img.shape[:2])
+        results['img'] = mmcv.imresize(img, (w, h), interpolation=self.interpolation)
+
+        return results
+
+    def batch(self, results):
+        imgs = results['img']
+        h, w = _target_size(self.size, *imgs.shape[1:3])
+        out = np.empty((len(imgs), h, w) + imgs.shape[3:], dtype=imgs.dtype)
+        for img, dst in zip(imgs, out):
+            # cv2 writes into the slice of the output block when shape and type match
+            cv2.resize(img, (w, h), dst=dst, interpolation=cv2_interp_codes[self.interpolation])
+        results['img'] = out
+
+        return results
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(size={self.size}, interpolation={self.interpolation})'
+
+
+@PIPELINES.register_module()
+class CenterCrop(object):
+    """Crop the center of images.
+    Both modes return views of the input, no pixel is copied.
+    Args:
+        crop_size (int | tuple[int, int], required): Expected size after cropping, (h, w).
+    """
+
+    deterministic = True
+
+    def __init__(self, crop_size):
+        if isinstance(crop_size, int):
+            crop_size = (crop_size, crop_size)
+        assert isinstance(crop_size, tuple) and len(crop_size) == 2 and min(crop_size) > 0
+        self.crop_size = crop_size
+
+    def _offsets(self, height, width):
+        crop_h, crop_w = min(self.crop_size[0], height), min(self.crop_size[1], width)
+
+        return (height - crop_h) // 2, (width - crop_w) // 2, crop_h, crop_w
+
+    def __call__(self, results):
+        img = results['img']
+        y, x, h, w = self._offsets(*img.shape[:2])
+        results['img'] = img[y:y + h, x:x + w]
+
+        return results
+
+    def batch(self, results):
+        imgs = results['img']
+        y, x, h, w = self._offsets(*imgs.shape[1:3])
+        results['img'] = imgs[:, y:y + h, x:x + w]
+
+        return results
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(crop_size={self.crop_size})'
+
+
+@PIPELINES.register_module()
+class RandomCrop(object):
+    """Crop images at a random location.
+    The batch mode draws one location per image and gathers all crops with a single indexing.
+    Args:
+        size (int | tuple[int, int], required): Desired output size of the crop, (h, w).
+    """
+
+    deterministic = False
+
+    def __init__(self, size):
+        if isinstance(size, int):
+            size = (size, size)
+        assert isinstance(size, tuple) and len(size) == 2 and min(size) > 0
+        self.size = size
+
+    def __call__(self, results):
+        img = results['img']
+        height, width = img.shape[:2]
+        h, w = min(self.size[0], height), min(self.size[1], width)
+        y = np.random.randint(0, height - h + 1)
+        x = np.random.randint(0, width - w + 1)
+        results['img'] = img[y:y + h, x:x + w]
+
+        return results
+
+    def batch(self, results):
+        imgs = results['img']
+        num, height, width = imgs.shape[:3]
+        h, w = min(self.size[0], height), min(self.size[1], width)
+        ys = np.random.randint(0, height - h + 1, size=num)
+        xs = np.random.randint(0, width - w + 1, size=num)
+        # every crop is one element of the strided view of all windows, gathered in a single copy
+        windows = sliding_window_view(imgs, (h, w), axis=(1, 2))[np.arange(num), ys, xs]
+        results['img'] = np.moveaxis(windows, (-2, -1), (1, 2))
+
+        return results
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(size={self.size})'
+
+
+@PIPELINES.register_module()
+class RandomFlip(object):
+    """Flip images randomly.
+    Args:
+        flip_prob (float, optional): Probability of flipping an image. Default to 0.5.
+        direction (str, optional): 'horizontal' or 'vertical'. Default to 'horizontal'.
+    """
+
+    deterministic = False
+
+    def __init__(self, flip_prob=0.5, direction='horizontal'):
+        assert 0 <= flip_prob <= 1
+        assert direction in ['horizontal', 'vertical']
+        self.flip_prob = flip_prob
+        self.direction = direction
+
+    def __call__(self, results):
+        if np.random.rand() < self.flip_prob:
+            # a view with negative strides, ToTensor makes it contiguous
+            axis = 1 if self.direction == 'horizontal' else 0
+            results['img'] = np.flip(results['img'], axis=axis)
+
+        return results
+
+    def batch(self, results):
+        imgs = results['img']
+        flip = np.flatnonzero(np.random.rand(len(imgs)) < self.flip_prob)
+        if len(flip):
+            # only the flipped images are rewritten, in the block owned by the batch
+            imgs = results.writable('img')
+            imgs[flip] = np.flip(imgs[flip], axis=2 if self.direction == 'horizontal' else 1)
+
+        return results
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(flip_prob={self.flip_prob}, direction={self.direction})'
+
+
+@PIPELINES.register_module()
+class Normalize(object):
+    """Normalize images and convert them to float32.
+    ``(img - mean) / std`` is computed channel by channel as ``img * (1 / std) - mean / std``, the product
+    reading the uint8 input and writing float32 directly, so the conversion needs no intermediate float copy.
+    Color images are written channel-planar and returned as a H x W x C (N x H x W x C) view, hence
+    :class:`ImageToTensor` gets contiguous C x H x W (N x C x H x W) tensors for free. The channel reversal
+    of ``to_rgb`` only selects the output plane of every channel.
+    Args:
+        mean (Sequence[float], required): Mean values of the channels.
+        std (Sequence[float], required): Std values of the channels.
+        to_rgb (bool, optional): Whether to convert the image from BGR to RGB. Default to True.
+    """
+
+    deterministic = True
+
+    def __init__(self, mean, std, to_rgb=True):
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+        self.to_rgb = to_rgb
+        self.scale = (1. / self.std).astype(np.float32)
+        self.bias = (-self.mean * self.scale).astype(np.float32)
+
+    def _normalize(self, img, color):
+        if not color:
+            out = np.empty(img.shape, dtype=np.float32)
+            np.multiply(img, self.scale, out=out, casting='unsafe')
+            out += self.bias
+            return out
+
+        channels = img.shape[-1]
+        scale = np.broadcast_to(self.scale, (channels, ))
+        bias = np.broadcast_to(self.bias, (channels, ))
+        out = np.empty(img.shape[:-3] + (channels, ) + img.shape[-3:-1], dtype=np.float32)
+        for c in range(channels):
+            dst_c = channels - 1 - c if self.to_rgb else c
+            dst = out[..., dst_c, :, :]
+            np.multiply(img[..., c], scale[dst_c], out=dst, casting='unsafe')
+            dst += bias[dst_c]
+
+        return np.moveaxis(out, -3, -1)
+
+    def __call__(self, results):
+        img = results['img']
+        results['img'] = self._normalize(img, img.ndim == 3)
+
+        return results
+
+    def batch(self, results):
+        imgs = results['img']
+        results['img'] = self._normalize(imgs, imgs.ndim == 4)
+
+        return results
+
+    def __repr__(self):
+        return self.__class__.__name__ + f'(mean={self.mean.tolist()}, std={self.std.tolist()}, to_rgb={self.to_rgb})'
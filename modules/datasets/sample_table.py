@@ -0,0 +1,216 @@
+import numpy as np
+
+__all__ = ['StringTable', 'SampleTable']
+
+
+def _readonly(array):
+    """Return a read-only view of the array.
+    Args:
+        array (np.ndarray, required): The array to be protected.
+    Return:
+        :np.ndarray: A view of the array which can not be written.
+    """
+    array = array.view()
+    array.flags.writeable = False
+
+    return array
+
+
+class StringTable(object):
+    """Immutable table of strings packed into one contiguous utf-8 buffer.
+    String i is stored in ``buffer[offsets[i]:offsets[i + 1]]``, so the whole table costs two numpy
+    arrays instead of one python object per string.
+    Args:
+        buffer (np.ndarray, required): uint8 array holding the encoded strings back to back.
+        offsets (np.ndarray, required): int64 array with N + 1 monotonic offsets into the buffer.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = _readonly(np.asarray(buffer, dtype=np.uint8))
+        self.offsets = _readonly(np.asarray(offsets, dtype=np.int64))
+        assert self.offsets.ndim == 1 and len(self.offsets) >= 1, 'offsets should hold at least one element'
+
+    @classmethod
+    def from_list(cls, strings):
+        """Build a table from a sequence of python strings.
+        Args:
+            strings (Sequence[str], required): The strings to be packed.
+        Return:
+            :StringTable: The packed table.
+        """
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        return cls(buffer, offsets)
+
+    @property
+    def lengths(self):
+        """Length in bytes of every string.
+
+        Return:
+            :np.ndarray: int64 array of length N.
+        """
+        return np.diff(self.offsets)
+
+    def take(self, indices):
+        """Gather a sub table without decoding any string.
+        Args:
+            indices (array_like, required): Indices of the selected strings.
+        Return:
+            :StringTable: The strings at ``indices`` packed in a new table.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # position of every gathered byte in the original buffer
+        shift = np.repeat(self.offsets[:-1][indices] - offsets[:-1], lengths)
+        buffer = self.buffer[np.arange(offsets[-1], dtype=np.int64) + shift]
+
+        return StringTable(buffer, offsets)
+
+    def tolist(self):
+        """Decode the whole table.
+
+        Return:
+            :list[str]: All strings of the table.
+        """
+        return [self[i] for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'index {idx} is out of range for a table of {len(self)} strings')
+
+        return self.buffer[self.offsets[idx]:self.offsets[idx + 1]].tobytes().decode('utf-8')
+
+
+class SampleTable(object):
+    """Columnar storage of the samples of a dataset.
+    Labels live in one contiguous int64 array, relative paths in a :class:`StringTable` and in-memory
+    images in one stacked array. The per-sample dicts expected by the pipelines are only built on demand
+    by ``__getitem__``, which keeps the memory of large datasets flat and avoids touching the refcount of
+    millions of python objects in forked DataLoader workers.
+    Args:
+        gt_labels (array_like, required): Category index of every sample.
+        imgs (np.ndarray | None, optional): Images of all samples stacked along the first axis. Default to None.
+        filenames (StringTable | Sequence[str] | None, optional): Path of every sample relative to
+            ``img_prefix``. Default to None.
+        img_prefix (str | None, optional): Directory shared by all filenames. Default to None.
+    """
+
+    def __init__(self, gt_labels, imgs=None, filenames=None, img_prefix=None):
+        self.gt_labels = _readonly(np.ascontiguousarray(gt_labels, dtype=np.int64).reshape(-1))
+        if imgs is not None:
+            assert len(imgs) == len(self.gt_labels), \
+                f'imgs({len(imgs)}) and gt_labels({len(self.gt_labels)}) should have same length.'
+            # keep subclasses such as memory-mapped or shared memory arrays
+            imgs = _readonly(np.asanyarray(imgs))
+        if filenames is not None:
+            if not isinstance(filenames, StringTable):
+                filenames = StringTable.from_list(filenames)
+            assert len(filenames) == len(self.gt_labels), \
+                f'filenames({len(filenames)}) and gt_labels({len(self.gt_labels)}) should have same length.'
+        self.imgs = imgs
+        self.filenames = filenames
+        self.img_prefix = img_prefix
+
+    @classmethod
+    def from_infos(cls, data_infos):
+        """Build a table from the legacy list of per-sample dicts.
+        Args:
+            data_infos (list[dict], required): Dicts with the keys ``gt_label`` and either ``img`` or
+                ``img_prefix`` and ``img_info``.
+        Return:
+            :SampleTable: The columnar version of ``data_infos``.
+        """
+        supported_keys = {'gt_label', 'img', 'img_prefix', 'img_info'}
+        for info in data_infos:
+            if not set(info) <= supported_keys:
+                raise ValueError(f'Unsupported keys {set(info) - supported_keys} in data_infos.')
+
+        gt_labels = np.array([int(info['gt_label']) for info in data_infos], dtype=np.int64)
+        imgs, filenames, img_prefix = None, None, None
+        if len(data_infos) and 'img' in data_infos[0]:
+            imgs = np.stack([info['img'] for info in data_infos])
+        if len(data_infos) and 'img_info' in data_infos[0]:
+            filenames = [info['img_info']['filename'] for info in data_infos]
+            img_prefix = data_infos[0]['img_prefix']
+
+        return cls(gt_labels, imgs=imgs, filenames=filenames, img_prefix=img_prefix)
+
+    @classmethod
+    def from_arrays(cls, arrays, img_prefix=None):
+        """Build a table from the arrays returned by :meth:`to_arrays`.
+        Args:
+            arrays (dict[str, np.ndarray], required): The columns of the table, possibly memory-mapped.
+            img_prefix (str | None, optional): Directory shared by all filenames. Default to None.
+        Return:
+            :SampleTable: The restored table.
+        """
+        filenames = None
+        if 'filename_buffer' in arrays:
+            filenames = StringTable(arrays['filename_buffer'], arrays['filename_offsets'])
+
+        return cls(arrays['gt_labels'], imgs=arrays.get('imgs'), filenames=filenames, img_prefix=img_prefix)
+
+    def to_arrays(self):
+        """Export the columns of the table.
+
+        Return:
+            :dict[str, np.ndarray]: The arrays holding all samples, ``img_prefix`` excluded.
+        """
+        arrays = {'gt_labels': self.gt_labels}
+        if self.imgs is not None:
+            arrays['imgs'] = self.imgs
+        if self.filenames is not None:
+            arrays['filename_buffer'] = self.filenames.buffer
+            arrays['filename_offsets'] = self.filenames.offsets
+
+        return arrays
+
+    def take(self, indices):
+        """Gather the samples at ``indices`` into a new table.
+        Args:
+            indices (array_like, required): Indices of the selected samples.
+        Return:
+            :SampleTable: The selected samples.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+
+        return SampleTable(
+            self.gt_labels[indices],
+            imgs=None if self.imgs is None else self.imgs[indices],
+            filenames=None if self.filenames is None else self.filenames.take(indices),
+            img_prefix=self.img_prefix
+        )
+
+    def __len__(self):
+        return len(self.gt_labels)
+
+    def __getitem__(self, idx):
+        """Build the information dict of one sample.
+        Args:
+            idx (int, required): Index of data.
+        Return:
+            :dict: Information of the sample, with the same layout as the legacy ``data_infos`` items.
+        """
+        info = {}
+        if self.imgs is not None:
+            info['img'] = self.imgs[idx]
+        if self.filenames is not None:
+            info['img_prefix'] = self.img_prefix
+            info['img_info'] = {'filename': self.filenames[idx]}
+        info['gt_label'] = np.array(self.gt_labels[idx], dtype=np.int64)
+
+        return info
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
@@ -0,0 +1,6 @@
+from .distributed_sampler import DistributedSampler
+from .block_shuffle_sampler import BlockShuffleSampler
+from .sharded_sampler import ShardedSampler
+from .class_balanced_sampler import ClassBalancedSampler
+
+__all__ = ['DistributedSampler', 'BlockShuffleSampler', 'ShardedSampler', 'ClassBalancedSampler']
@@ -0,0 +1,75 @@
+import numpy as np
+from ..builder import SAMPLERS
+from .distributed_sampler import DistributedSampler
+
+
+@SAMPLERS.register_module()
+class BlockShuffleSampler(DistributedSampler):
+    """Sampler shuffling contiguous blocks of indices instead of single indices.
+    The dataset is cut into blocks of ``block_size`` consecutive indices whose order is shuffled, then
+    the indices are shuffled inside consecutive windows of ``window_size`` indices of the new order. Over
+    packed or sorted-on-disk data every worker reads inside a few contiguous regions at a time, so the reads
+    stay mostly sequential while the order stays close to a random permutation. Every rank takes a
+    contiguous part of the shuffled order, which keeps the blocks of a rank together.
+    Args:
+        dataset (Dataset, required): Dataset used for sampling.
+        num_replicas (int | None, optional): Number of processes participating in distributed training.
+            Default to None, the world size.
+        rank (int | None, optional): Rank of the current process. Default to None, the current rank.
+        shuffle (bool, optional): Whether to shuffle the indices at every epoch. Default to True.
+        round_up (bool, optional): Whether to add extra samples to make the number of samples evenly
+            divisible by the number of replicas. Default to True.
+        seed (int | None, optional): Seed of the shuffling, identical on all ranks. Default to None, 0.
+        block_size (int, optional): Number of consecutive indices of a block. Default to 256.
+        window_size (int | None, optional): Number of indices shuffled together after the blocks are
+            shuffled. Default to None, four blocks.
+    """
+
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, round_up=True, seed=None,
+                 block_size=256, window_size=None):
+        super().__init__(dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle, round_up=round_up,
+                         seed=seed)
+        assert block_size > 0, 'block_size should be positive'
+        self.block_size = block_size
+        self.window_size = window_size if window_size is not None else 4 * block_size
+
+    def block_shuffle(self, num_samples, rng):
+        """Shuffle the blocks of ``range(num_samples)``, then the indices inside every window.
+        Args:
+            num_samples (int, required): Number of indices.
+            rng (np.random.Generator, required): The random generator.
+        Return:
+            :np.ndarray: int64 permutation of ``range(num_samples)``.
+        """
+        num_blocks = -(-num_samples // self.block_size)
+        blocks = np.arange(num_blocks * self.block_size, dtype=np.int64).reshape(num_blocks, self.block_size)
+        indices = blocks[rng.permutation(num_blocks)].ravel()
+        indices = indices[indices < num_samples]
+
+        num_windows = -(-num_samples // self.window_size)
+        # pad the last window, the padding is shuffled with it and dropped afterwards
+        windows = np.full(num_windows * self.window_size, -1, dtype=np.int64)
+        windows[:num_samples] = indices
+        windows = rng.permuted(windows.reshape(num_windows, self.window_size), axis=1).ravel()
+
+        return windows[windows >= 0]
+
+    def __iter__(self):
+        # deterministically shuffle based on epoch
+        if self.shuffle:
+            indices = self.block_shuffle(len(self.dataset), np.random.default_rng(self.epoch + self.seed))
+        else:
+            indices = np.arange(len(self.dataset), dtype=np.int64)
+
+        # add extra samples to make it evenly divisible
+        if self.round_up:
+            indices = np.resize(indices, self.total_size)
+        assert len(indices) == self.total_size
+
+        # a contiguous part for every rank
+        num_samples = -(-self.total_size // self.num_replicas)
+        indices = indices[self.rank * num_samples:(self.rank + 1) * num_samples]
+        if self.round_up:
+            assert len(indices) == self.num_samples
+
+        return iter(indices.tolist())
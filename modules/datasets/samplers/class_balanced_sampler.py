@@ -0,0 +1,105 @@
+import numpy as np
+from mmcv.runner import get_dist_info
+from torch.utils.data import Sampler
+from ..builder import SAMPLERS
+
+
+def build_alias_table(probs):
+    """Build the alias table of a discrete distribution with Vose's method.
+    Args:
+        probs (array_like, required): Probabilities of the outcomes, normalized internally.
+    Return:
+        :tuple[np.ndarray, np.ndarray]: The acceptance probability and the alias of every outcome.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    num = len(probs)
+    scaled = probs * num / probs.sum()
+    accept = np.ones(num, dtype=np.float64)
+    alias = np.arange(num, dtype=np.int64)
+    small = [i for i in range(num) if scaled[i] < 1.]
+    large = [i for i in range(num) if scaled[i] >= 1.]
+    while small and large:
+        s, g = small.pop(), large.pop()
+        accept[s], alias[s] = scaled[s], g
+        scaled[g] -= 1. - scaled[s]
+        (small if scaled[g] < 1. else large).append(g)
+    # the outcomes left are exactly 1 up to rounding errors
+
+    return accept, alias
+
+
+@SAMPLERS.register_module()
+class ClassBalancedSampler(Sampler):
+    """Sampler drawing samples with replacement so that the classes follow a given distribution.
+    The indices of every class are grouped once from the label column of the dataset, and an alias table
+    over the classes is built once. A draw then picks a class in O(1) with the alias table and a sample
+    uniformly inside the class, all vectorized with numpy.
+    Args:
+        dataset (Dataset, required): Dataset used for sampling, with ``get_gt_labels``.
+        num_replicas (int | None, optional): Number of processes participating in distributed training.
+            Default to None, the world size.
+        rank (int | None, optional): Rank of the current process. Default to None, the current rank.
+        shuffle (bool, optional): Unused, the draws are random. Kept for ``build_dataloader``. Default to True.
+        seed (int | None, optional): Seed of the draws. Default to None, 0.
+        num_samples (int | None, optional): Number of samples drawn by all ranks in one epoch. Default to None,
+            the length of the dataset.
+        class_weights (Sequence[float] | None, optional): Relative probability of every class. Default to None,
+            the same probability for all classes holding samples.
+    """
+
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, seed=None, num_samples=None,
+                 class_weights=None):
+        current_rank, world_size = get_dist_info()
+        self.dataset = dataset
+        self.num_replicas = num_replicas if num_replicas is not None else world_size
+        self.rank = rank if rank is not None else current_rank
+        self.seed = seed if seed is not None else 0
+        self.epoch = 0
+        total = num_samples if num_samples is not None else len(dataset)
+        self.num_samples = -(-total // self.num_replicas)
+
+        labels = np.asarray(dataset.get_gt_labels(), dtype=np.int64)
+        # indices sorted by class, class c occupies class_indices[class_offsets[c]:class_offsets[c + 1]]
+        self.class_indices = np.argsort(labels, kind='stable')
+        self.class_counts = np.bincount(labels)
+        self.class_offsets = np.concatenate([[0], np.cumsum(self.class_counts)[:-1]]).astype(np.int64)
+
+        if class_weights is None:
+            class_weights = (self.class_counts > 0).astype(np.float64)
+        class_weights = np.asarray(class_weights, dtype=np.float64)[:len(self.class_counts)]
+        # classes without samples can not be drawn
+        class_weights = np.where(self.class_counts > 0, class_weights, 0.)
+        assert class_weights.sum() > 0, 'At least one class with samples should have a positive weight.'
+        self.accept, self.alias = build_alias_table(class_weights)
+
+    def sample(self, num, rng):
+        """Draw indices of the dataset.
+        Args:
+            num (int, required): Number of indices.
+            rng (np.random.Generator, required): The random generator.
+        Return:
+            :np.ndarray: int64 indices drawn with replacement.
+        """
+        # the integer part of one uniform picks the column of the table, its fraction decides the alias
+        column = rng.random(num) * len(self.accept)
+        classes = column.astype(np.int64)
+        classes = np.where(column - classes < self.accept[classes], classes, self.alias[classes])
+        positions = self.class_offsets[classes] + (rng.random(num) * self.class_counts[classes]).astype(np.int64)
+
+        return self.class_indices[positions]
+
+    def __iter__(self):
+        # deterministic draws based on epoch, different on every rank
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank])
+
+        return iter(self.sample(self.num_samples, rng).tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        """Set the epoch of the draws.
+        Args:
+            epoch (int, required): The epoch number.
+        """
+        self.epoch = epoch
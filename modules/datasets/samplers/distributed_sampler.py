@@ -0,0 +1,49 @@
+import torch
+from torch.utils.data import DistributedSampler as _DistributedSampler
+from ..builder import SAMPLERS
+
+
+@SAMPLERS.register_module()
+class DistributedSampler(_DistributedSampler):
+    """Sampler restricting the loading of data to a subset of the dataset for every rank.
+    Args:
+        dataset (Dataset, required): Dataset used for sampling.
+        num_replicas (int | None, optional): Number of processes participating in distributed training.
+            Default to None, the world size.
+        rank (int | None, optional): Rank of the current process. Default to None, the current rank.
+        shuffle (bool, optional): Whether to shuffle the indices at every epoch. Default to True.
+        round_up (bool, optional): Whether to add extra samples to make the number of samples evenly
+            divisible by the number of replicas. Default to True.
+        seed (int | None, optional): Seed of the shuffling, identical on all ranks. Default to None, 0.
+    """
+
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, round_up=True, seed=None):
+        super().__init__(dataset, num_replicas=num_replicas, rank=rank)
+        self.shuffle = shuffle
+        self.round_up = round_up
+        if self.round_up:
+            self.total_size = self.num_samples * self.num_replicas
+        else:
+            self.total_size = len(self.dataset)
+        self.seed = seed if seed is not None else 0
+
+    def __iter__(self):
+        # deterministically shuffle based on epoch
+        if self.shuffle:
+            g = torch.Generator()
+            g.manual_seed(self.epoch + self.seed)
+            indices = torch.randperm(len(self.dataset), generator=g).tolist()
+        else:
+            indices = torch.arange(len(self.dataset)).tolist()
+
+        # add extra samples to make it evenly divisible
+        if self.round_up:
+            indices = (indices * int(self.total_size / len(indices) + 1))[:self.total_size]
+        assert len(indices) == self.total_size
+
+        # subsample
+        indices = indices[self.rank:self.total_size:self.num_replicas]
+        if self.round_up:
+            assert len(indices) == self.num_samples
+
+        return iter(indices)
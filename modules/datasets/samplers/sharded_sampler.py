@@ -0,0 +1,65 @@
+import numpy as np
+from mmcv.runner import get_dist_info
+from torch.utils.data import Sampler
+from ..builder import SAMPLERS
+
+
+@SAMPLERS.register_module()
+class ShardedSampler(Sampler):
+    """Sampler of a dataset whose ranks only hold their own part of the samples.
+    The dataset, e.g. ``CustomDataset(shard_by_rank=True)``, holds the local samples of the rank and the
+    number of samples of every rank in ``shard_sizes``. Every rank draws the same number of indices,
+    ``ceil(total / num_replicas)``, from a permutation of its local indices reshuffled at every epoch,
+    repeating or leaving out a few of them when the parts are uneven. The total work of an epoch stays the
+    one of the whole dataset, and the left out samples change from epoch to epoch. Samples never move
+    between ranks, a rank only ever loads its own part, so uneven parts are balanced by repeating or
+    leaving out local samples only.
+    Args:
+        dataset (Dataset, required): The local part of the dataset, with ``shard_sizes``.
+        num_replicas (int | None, optional): Number of processes participating in distributed training.
+            Default to None, the world size.
+        rank (int | None, optional): Rank of the current process. Default to None, the current rank.
+        shuffle (bool, optional): Whether to shuffle the indices at every epoch. Default to True.
+        seed (int | None, optional): Seed of the shuffling. Default to None, 0.
+    """
+
+    # samples the local part of a dataset sharded by rank, see ``build_dataloader``
+    sharded = True
+
+    def __init__(self, dataset, num_replicas=None, rank=None, shuffle=True, seed=None):
+        current_rank, world_size = get_dist_info()
+        self.dataset = dataset
+        self.num_replicas = num_replicas if num_replicas is not None else world_size
+        self.rank = rank if rank is not None else current_rank
+        self.shuffle = shuffle
+        self.seed = seed if seed is not None else 0
+        self.epoch = 0
+
+        shard_sizes = getattr(dataset, 'shard_sizes', None)
+        assert shard_sizes is not None, f'{type(dataset).__name__} is not sharded by rank.'
+        assert len(shard_sizes) == self.num_replicas and shard_sizes[self.rank] == len(dataset), \
+            f'shard_sizes({shard_sizes}) does not match rank {self.rank} of {self.num_replicas} replicas.'
+        self.total_size = int(sum(shard_sizes))
+        self.num_samples = -(-self.total_size // self.num_replicas)
+
+    def __iter__(self):
+        # deterministically shuffle based on epoch, differently on every rank
+        if self.shuffle:
+            indices = np.random.default_rng([self.seed, self.epoch, self.rank]).permutation(len(self.dataset))
+        else:
+            indices = np.arange(len(self.dataset), dtype=np.int64)
+
+        # every rank yields the same number of indices
+        indices = np.resize(indices, self.num_samples)
+
+        return iter(indices.tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        """Set the epoch of the shuffling.
+        Args:
+            epoch (int, required): The epoch number.
+        """
+        self.epoch = epoch
@@ -0,0 +1,201 @@
+import atexit
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+import torch.distributed as dist
+from multiprocessing import resource_tracker, shared_memory
+from mmcv.runner import get_dist_info
+
+__all__ = [
+    'SharedNDArray', 'create_shared_zeros', 'create_shared_array', 'attach_shared_array', 'node_segment_prefix',
+    'share_arrays_on_node'
+]
+
+
+def get_local_dist_info():
+    """Get the rank of the process inside its node and the number of processes of the node.
+
+    Return:
+        :tuple[int, int]: local rank and local world size, read from the variables set by
+            ``torch.distributed.launch``/``torchrun`` and falling back to a single node.
+    """
+    rank, world_size = get_dist_info()
+    local_rank = int(os.environ.get('LOCAL_RANK', rank))
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+
+    return local_rank, local_world_size
+
+
+class SharedNDArray(np.ndarray):
+    """Numpy array backed by a named POSIX shared memory segment.
+    Pickling the whole array, e.g. when DataLoader workers are spawned, sends the name of the segment
+    instead of the data and the receiver attaches to the same memory.
+    """
+
+    def __array_finalize__(self, obj):
+        self._shm = getattr(obj, '_shm', None)
+        self._shm_name = None
+        # only a view of the whole segment can be re-attached by name
+        if obj is not None and getattr(obj, '_shm_name', None) is not None and self.shape == obj.shape \
+                and self.strides == obj.strides and self.ctypes.data == obj.ctypes.data:
+            self._shm_name = obj._shm_name
+
+    def __reduce__(self):
+        if self._shm_name is None:
+            return np.asarray(self).__reduce__()
+
+        return attach_shared_array, (self._shm_name, self.shape, self.dtype.str, self.flags.writeable)
+
+
+def _attach_segment(name):
+    """Attach to an existing segment without registering it to the resource tracker.
+    Only the creator owns the segment, a tracker knowing it would unlink it when the attaching process exits.
+    Args:
+        name (str, required): Name of the segment.
+    Return:
+        :SharedMemory: The attached segment.
+    """
+    try:
+        # python >= 3.13
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _wrap(shm, shape, dtype, writeable=True):
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf).view(SharedNDArray)
+    array._shm = shm
+    array._shm_name = shm.name
+    array.flags.writeable = writeable
+
+    return array
+
+
+def create_shared_zeros(name, shape, dtype):
+    """Create a zero-filled array in a new shared memory segment.
+    The pages are only allocated when written. The segment is unlinked when the creating process exits. If
+    it crashes, the resource tracker of multiprocessing unlinks the segment instead.
+    Args:
+        name (str, required): Name of the segment.
+        shape (tuple[int], required): Shape of the array.
+        dtype (str | np.dtype, required): Data type of the array.
+    Return:
+        :SharedNDArray: Writable array backed by the segment.
+    """
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    shared = _wrap(shm, tuple(shape), dtype)
+
+    creator = os.getpid()
+
+    def unlink():
+        # forked DataLoader workers inherit the handler but must not remove the segment
+        if os.getpid() == creator:
+            shm.unlink()
+            try:
+                shm.close()
+            except BufferError:
+                # arrays still alive at exit, the mapping goes away with the process
+                pass
+
+    atexit.register(unlink)
+
+    return shared
+
+
+def create_shared_array(name, array):
+    """Copy an array into a new shared memory segment, see :func:`create_shared_zeros`.
+    Args:
+        name (str, required): Name of the segment.
+        array (np.ndarray, required): The array to be shared.
+    Return:
+        :SharedNDArray: Read-only array backed by the segment.
+    """
+    array = np.ascontiguousarray(array)
+    shared = create_shared_zeros(name, array.shape, array.dtype)
+    shared[...] = array
+    shared.flags.writeable = False
+
+    return shared
+
+
+def attach_shared_array(name, shape, dtype, writeable=False):
+    """Attach to an array created by :func:`create_shared_array`.
+    Args:
+        name (str, required): Name of the segment.
+        shape (tuple[int], required): Shape of the array.
+        dtype (str | np.dtype, required): Data type of the array.
+        writeable (bool, optional): Whether the array can be written. Default to False.
+    Return:
+        :SharedNDArray: Array backed by the segment, without copy.
+    """
+    return _wrap(_attach_segment(name), tuple(shape), np.dtype(dtype), writeable)
+
+
+def node_segment_prefix(key):
+    """Get the name prefix of the shared memory segments of some data, the same on all ranks of the job.
+    It must be called by all ranks.
+    Args:
+        key (str, required): Identity of the data, e.g. dataset type, path and split.
+    Return:
+        :str: The prefix.
+    """
+    _, world_size = get_dist_info()
+    # a token of the job keeps concurrent jobs and crashed runs apart
+    token = [uuid.uuid4().hex[:8]]
+    if world_size > 1:
+        dist.broadcast_object_list(token, src=0)
+
+    return 'qcls_' + hashlib.sha1(f'{key}:{token[0]}'.encode('utf-8')).hexdigest()[:16]
+
+
+def share_arrays_on_node(key, load_fn):
+    """Load arrays once per node into shared memory and attach all other processes of the node to them.
+    The process of local rank 0 calls ``load_fn`` and copies the arrays into POSIX shared memory, then
+    the other ranks of the node attach zero-copy after a barrier. DataLoader workers inherit or re-attach
+    the same memory, so a node holds a single copy of the data. It must be called by all ranks.
+    Args:
+        key (str, required): Identity of the data, e.g. dataset type, path and split.
+        load_fn (callable, required): Function returning ``(arrays, meta)``, a dict of numpy arrays and a
+            json serializable dict.
+    Return:
+        :tuple[dict[str, SharedNDArray], dict]: The shared arrays and the meta information.
+    """
+    _, world_size = get_dist_info()
+    local_rank, _ = get_local_dist_info()
+    prefix = node_segment_prefix(key)
+
+    if local_rank == 0:
+        arrays, meta = load_fn()
+        arrays = {
+            name: create_shared_array(f'{prefix}_{i}', array)
+            for i, (name, array) in enumerate(arrays.items())
+        }
+        header = json.dumps({
+            'arrays': [[name, list(array.shape), array.dtype.str] for name, array in arrays.items()],
+            'meta': meta
+        }).encode('utf-8')
+        create_shared_array(f'{prefix}_header', np.frombuffer(header, dtype=np.uint8))
+
+    if world_size > 1:
+        dist.barrier()
+
+    if local_rank != 0:
+        header_shm = _attach_segment(f'{prefix}_header')
+        header = json.loads(bytes(header_shm.buf).rstrip(b'\0').decode('utf-8'))
+        header_shm.close()
+        arrays = {
+            name: attach_shared_array(f'{prefix}_{i}', shape, dtype)
+            for i, (name, shape, dtype) in enumerate(header['arrays'])
+        }
+        meta = header['meta']
+
+    return arrays, meta
@@ -1,14 +1,20 @@
 import gzip
 import hashlib
+import http.client
+import json
 import os
 import os.path as osp
-import shutil
+import queue
 import tarfile
+import threading
 import urllib.error
 import urllib.request
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
-__all__ = ['rm_suffix', 'check_integrity', 'download_and_extract_archive']
+__all__ = ['rm_suffix', 'check_integrity', 'check_integrity_many', 'download_urls', 'download_and_extract_archive']
+
+VERIFY_MODES = ('full', 'fast', 'none')
 
 
 def rm_suffix(s, suffix=None):
@@ -52,33 +58,211 @@ def check_md5(file_path, md5, **kwargs):
     return md5 == calculate_md5(file_path, **kwargs)
 
 
-def check_integrity(file_path, md5=None):
+class HashManifest(object):
+    """Sidecar file of verified md5 values of the files in one directory.
+    Every entry records the size, modification time and inode of the file when it was hashed, an entry
+    whose file changed since then is ignored. The manifest is merged with the one on disk and replaced
+    atomically when saved, so several processes can update it.
+    Args:
+        directory (str, required): Directory of the hashed files.
+    """
+
+    filename = '.qcls_md5_manifest.json'
+    _lock = threading.Lock()
+
+    def __init__(self, directory):
+        self.manifest_path = osp.join(directory, self.filename)
+        self.entries = self._read()
+        self.updated = {}
+
+    def _read(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _stat(file_path):
+        stat = os.stat(file_path)
+
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino}
+
+    def get(self, file_path):
+        """Get the verified md5 of an unchanged file.
+        Args:
+            file_path (str, required): Path of the file.
+        Return:
+            :str | None: The md5 value, None if the file is unknown or changed.
+        """
+        entry = self.entries.get(osp.basename(file_path))
+        if entry is None or entry['stat'] != self._stat(file_path):
+            return None
+
+        return entry['md5']
+
+    def set(self, file_path, md5):
+        """Record the md5 of a file.
+        Args:
+            file_path (str, required): Path of the file.
+            md5 (str, required): The md5 value of the current content.
+        """
+        entry = {'stat': self._stat(file_path), 'md5': md5}
+        self.entries[osp.basename(file_path)] = entry
+        self.updated[osp.basename(file_path)] = entry
+
+    def save(self):
+        """Merge the recorded entries into the manifest on disk.
+        """
+        if not self.updated:
+            return
+        with self._lock:
+            entries = self._read()
+            entries.update(self.updated)
+            tmp_path = f'{self.manifest_path}.tmp-{os.getpid()}-{threading.get_ident()}'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.manifest_path)
+            except OSError:
+                # read-only directory, hash again next time
+                pass
+        self.updated = {}
+
+
+def check_integrity(file_path, md5=None, verify='full'):
     """Check whether the file is complete by verifying the md5 value.
     Args:
         file_path (str, required): Enter the path of the file to be calculated.
         md5 (int, optional): Md5 validation value. Default to None.
+        verify (str, optional): 'full' always hashes the file, 'fast' skips hashing files unchanged since
+            their md5 was verified, 'none' only checks the existence. Default to 'full'.
     Return:
         :bool: is the file complete.
     """
-    if not osp.isfile(file_path):
+    return check_integrity_many([(file_path, md5)], verify=verify)
+
+
+def check_integrity_many(files, verify='full', num_threads=8):
+    """Check the integrity of several files, hashing them in parallel.
+    Args:
+        files (Sequence[tuple[str, str | None]], required): Pairs of file path and md5 validation value.
+        verify (str, optional): One of 'full', 'fast' and 'none', see :func:`check_integrity`. Default to 'full'.
+        num_threads (int, optional): Maximum number of hashing threads, hashlib releases the GIL.
+            Default to 8.
+    Return:
+        :bool: are all the files complete.
+    """
+    assert verify in VERIFY_MODES, f'verify should be one of {VERIFY_MODES}, but got {verify}'
+    if not all(osp.isfile(file_path) for file_path, _ in files):
         return False
-    if md5 is None:
+    files = [(osp.abspath(file_path), md5) for file_path, md5 in files if md5 is not None]
+    if verify == 'none' or not files:
         return True
 
-    return check_md5(file_path, md5)
+    manifests = {}
+    to_hash = []
+    for file_path, md5 in files:
+        directory = osp.dirname(file_path)
+        if directory not in manifests:
+            manifests[directory] = HashManifest(directory)
+        if verify == 'full' or manifests[directory].get(file_path) != md5:
+            to_hash.append((file_path, md5))
+
+    with ThreadPoolExecutor(max(1, min(num_threads, len(to_hash)))) as executor:
+        calculated = list(executor.map(calculate_md5, [file_path for file_path, _ in to_hash]))
+
+    complete = True
+    for (file_path, md5), file_md5 in zip(to_hash, calculated):
+        manifests[osp.dirname(file_path)].set(file_path, file_md5)
+        complete = complete and file_md5 == md5
+    for manifest in manifests.values():
+        manifest.save()
+
+    return complete
+
+
+def _fetch_to_part(url, part_path, md5, chunk_size, timeout):
+    """Append the missing bytes of a partial download, resuming it with an HTTP Range request.
+    Args:
+        url (str, required): URL of the file.
+        part_path (str, required): Path of the partial file.
+        md5 (hashlib._Hash, required): Hash of the bytes already in the partial file, updated in place.
+        chunk_size (int, required): Size of the blocks read from the response.
+        timeout (float, required): Timeout of the connection in seconds.
+    Return:
+        :hashlib._Hash: The hash of the whole partial file, a new one if the server restarted from zero.
+    """
+    offset = osp.getsize(part_path) if osp.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header('Range', f'bytes={offset}-')
+    try:
+        resp = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise
+        # the range starts at or after the end of the file, the size of the file tells which
+        if e.headers.get('Content-Range', '') == f'bytes */{offset}':
+            return md5
+        os.remove(part_path)
+        return _fetch_to_part(url, part_path, hashlib.md5(), chunk_size, timeout)
 
+    with resp:
+        mode = 'ab'
+        if offset and resp.status != 206:
+            # the server ignores ranges and sends the whole file
+            mode, md5 = 'wb', hashlib.md5()
+        received = 0
+        with open(part_path, mode) as of:
+            for chunk in iter(lambda: resp.read(chunk_size), b''):
+                of.write(chunk)
+                md5.update(chunk)
+                received += len(chunk)
+        # a dropped connection only ends the body early, the length tells it from a complete one
+        length = resp.headers.get('Content-Length')
+        if length is not None and received < int(length):
+            raise http.client.IncompleteRead(b'', int(length) - received)
 
-def download_url_to_file(url, file_path):
+    return md5
+
+
+def download_url_to_file(url, file_path, chunk_size=1024 * 1024, retries=3, timeout=60.):
     """Download the file to the path through the url.
+    The content is streamed into ``<file_path>.part`` and hashed on the way. An interrupted download,
+    in this call or a previous run, is resumed from the end of the partial file with an HTTP Range request,
+    and the partial file is renamed once complete.
     Args:
         url (str, required): URL of the file.
         file_path (str, required): Path to save the downloaded file
+        chunk_size (int, optional): Size of the blocks read from the response. Default to 1024 * 1024.
+        retries (int, optional): Number of resumed attempts after a failed one. Default to 3.
+        timeout (float, optional): Timeout of the connection in seconds. Default to 60.
+    Return:
+        :str: The md5 of the downloaded file.
     """
-    with urllib.request.urlopen(url) as resp, open(file_path, 'wb') as of:
-        shutil.copyfileobj(resp, of)
+    part_path = f'{file_path}.part'
+    md5 = hashlib.md5()
+    if osp.exists(part_path):
+        # only the bytes already downloaded are read back
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                md5.update(chunk)
 
+    for attempt in range(retries + 1):
+        try:
+            md5 = _fetch_to_part(url, part_path, md5, chunk_size, timeout)
+            break
+        except (urllib.error.URLError, http.client.HTTPException, IOError) as e:
+            if isinstance(e, urllib.error.HTTPError) or attempt == retries:
+                raise
+            print(f'Download of {url} interrupted ({e}), resuming from {osp.getsize(part_path)} bytes.')
+    os.replace(part_path, file_path)
+
+    return md5.hexdigest()
 
-def download_url(url, root, filename=None, md5=None):
+
+def download_url(url, root, filename=None, md5=None, verify='full'):
     """Download a file from a url and place it in root.
     Args:
         url (str, required): URL to download file from.
@@ -87,6 +271,7 @@ def download_url(url, root, filename=None, md5=None):
             If filename is None, use the basename of the URL.
         md5 (str | None, optional): MD5 checksum of the download.
             If md5 is None, download without md5 check.
+        verify (str, optional): How to verify an existing file, see :func:`check_integrity`. Default to 'full'.
     """
     root = osp.expanduser(root)
     if not filename:
@@ -95,67 +280,248 @@ def download_url(url, root, filename=None, md5=None):
 
     os.makedirs(root, exist_ok=True)
 
-    if check_integrity(file_path, md5):
+    if check_integrity(file_path, md5, verify=verify):
         print(f'Using downloaded and verified file: {file_path}')
     else:
         try:
             print(f'Downloading {url} to {file_path}')
-            download_url_to_file(url, file_path)
+            file_md5 = download_url_to_file(url, file_path)
         except (urllib.error.URLError, IOError) as e:
             if url[:5] == 'https':
                 url = url.replace('https:', 'http:')
                 print('Failed download. Trying https -> http instead.'
                       f' Downloading {url} to {file_path}')
-                download_url_to_file(url, file_path)
+                file_md5 = download_url_to_file(url, file_path)
             else:
                 raise e
-        # check integrity of downloaded file
-        if not check_integrity(file_path, md5):
+        # check integrity of downloaded file with the md5 computed while streaming
+        manifest = HashManifest(osp.dirname(osp.abspath(file_path)))
+        manifest.set(file_path, file_md5)
+        manifest.save()
+        if md5 is not None and file_md5 != md5:
             raise RuntimeError('File not found or corrupted.')
 
 
-def extract_archive(from_path, to_path=None, remove_finished=False):
+def download_urls(resources, root, num_threads=4, verify='full'):
+    """Download several files of a dataset concurrently.
+    Args:
+        resources (Sequence[tuple[str, str | None, str | None]], required): Triplets of url, file name
+            and md5 checksum, see :func:`download_url`.
+        root (str, required): Directory to place downloaded files in.
+        num_threads (int, optional): Maximum number of concurrent downloads. Default to 4.
+        verify (str, optional): How to verify existing files, see :func:`check_integrity`. Default to 'full'.
+    Return:
+        :list[str]: Paths of the downloaded files.
+    """
+    resources = list(resources)
+    with ThreadPoolExecutor(max(1, min(num_threads, len(resources)))) as executor:
+        futures = [
+            executor.submit(download_url, url, root, filename=filename, md5=md5, verify=verify)
+            for url, filename, md5 in resources
+        ]
+        for future in futures:
+            future.result()
+
+    return [osp.join(osp.expanduser(root), filename or osp.basename(url)) for url, filename, _ in resources]
+
+
+class PipelinedWriter(object):
+    """Write files in a background thread, computing their md5 on the way.
+    The producer decompresses and queues chunks, the writer thread writes and hashes them, so the disk
+    writes overlap with the decompression. The queue is bounded, the memory stays under ``queue_size``
+    chunks whatever the size of the files. The md5 of every written file is recorded in the
+    :class:`HashManifest` of its directory, so a later :func:`check_integrity` does not read it again.
+    Args:
+        queue_size (int, optional): Maximum number of chunks waiting to be written. Default to 16.
+    """
+
+    def __init__(self, queue_size=16):
+        self.queue = queue.Queue(queue_size)
+        self.md5s = {}
+        self.error = None
+        self.manifests = {}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+
+    def write(self, file_path, chunks, mtime=None, mode=None):
+        """Queue the content of one file.
+        Args:
+            file_path (str, required): Path of the output file.
+            chunks (Iterable[bytes], required): The content of the file.
+            mtime (float | None, optional): Modification time set on the file. Default to None.
+            mode (int | None, optional): Permission bits set on the file. Default to None.
+        """
+        self._put(('open', file_path))
+        for chunk in chunks:
+            self._put(('data', chunk))
+        self._put(('close', mtime, mode))
+
+    def _run(self):
+        out_f, file_path, md5 = None, None, None
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                if self.error is not None:
+                    # keep draining so the producer never blocks on a full queue
+                    continue
+                if item[0] == 'open':
+                    file_path, md5 = item[1], hashlib.md5()
+                    os.makedirs(osp.dirname(file_path) or '.', exist_ok=True)
+                    out_f = open(file_path, 'wb')
+                elif item[0] == 'data':
+                    out_f.write(item[1])
+                    md5.update(item[1])
+                else:
+                    out_f.close()
+                    out_f = None
+                    mtime, mode = item[1:]
+                    if mode is not None:
+                        os.chmod(file_path, mode)
+                    if mtime is not None:
+                        os.utime(file_path, (mtime, mtime))
+                    self._record(file_path, md5.hexdigest())
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+        if out_f is not None:
+            out_f.close()
+
+    def _record(self, file_path, md5):
+        file_path = osp.abspath(file_path)
+        directory = osp.dirname(file_path)
+        if directory not in self.manifests:
+            self.manifests[directory] = HashManifest(directory)
+        self.manifests[directory].set(file_path, md5)
+        self.md5s[file_path] = md5
+
+    def flush(self):
+        """Wait until the queued files are completely written, e.g. before linking to one of them."""
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self, check=True):
+        """Wait for the queued files and save the manifests.
+        Args:
+            check (bool, optional): Whether to raise the error of the writer thread and save the manifests.
+                False only stops the thread, e.g. while another error is propagating. Default to True.
+        Return:
+            :dict[str, str]: The md5 of every written file by absolute path.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if not check:
+            return self.md5s
+        if self.error is not None:
+            raise self.error
+        for manifest in self.manifests.values():
+            manifest.save()
+
+        return self.md5s
+
+
+def _read_chunks(f, chunk_size):
+    return iter(lambda: f.read(chunk_size), b'')
+
+
+def _safe_member(member, to_path):
+    """Check a tar member before extracting it.
+    Args:
+        member (tarfile.TarInfo, required): The member.
+        to_path (str, required): The extraction directory.
+    Return:
+        :tarfile.TarInfo: The member, rejecting absolute paths and paths escaping ``to_path``.
+    """
+    if hasattr(tarfile, 'data_filter'):
+        return tarfile.data_filter(member, to_path)
+    target = osp.realpath(osp.join(to_path, member.name))
+    if not target.startswith(osp.realpath(to_path) + os.sep):
+        raise tarfile.TarError(f'Member {member.name} is outside of the extraction directory.')
+
+    return member
+
+
+def extract_archive(from_path, to_path=None, remove_finished=False, chunk_size=1024 * 1024, queue_size=16):
     """Extract compressed package file.
+    The archive is read in one streaming pass with constant memory: the members are decompressed chunk by
+    chunk and written by a :class:`PipelinedWriter`, which hashes them while writing.
     Args:
         from_path (str, required): Path of compressed package to be decompressed.
         to_path (str, optional): Output path of compressed package decompression. Default to None.
         remove_finished (bool, optional): Whether to delete the compressed package after decompression.
             Default to False.
+        chunk_size (int, optional): Size of the decompressed blocks. Default to 1024 * 1024.
+        queue_size (int, optional): Maximum number of blocks waiting to be written. Default to 16.
+    Return:
+        :dict[str, str]: The md5 of every extracted file by absolute path.
     """
     if to_path is None:
         to_path = osp.dirname(from_path)
 
-    if from_path.endswith('.tar'):
-        with tarfile.open(from_path, 'r') as tar:
-            tar.extractall(path=to_path)
-    elif from_path.endswith('.tar.gz') or from_path.endswith('.tgz'):
-        with tarfile.open(from_path, 'r:gz') as tar:
-            tar.extractall(path=to_path)
-    elif from_path.endswith('.tar.xz'):
-        with tarfile.open(from_path, 'r:xz') as tar:
-            tar.extractall(path=to_path)
-    elif from_path.endswith('.gz') and not from_path.endswith('.tar.gz'):
-        to_path = os.path.join(
-            to_path,
-            os.path.splitext(os.path.basename(from_path))[0])
-        with open(to_path, 'wb') as out_f, gzip.GzipFile(from_path) as zip_f:
-            out_f.write(zip_f.read())
-    elif from_path.endswith('.zip'):
-        with zipfile.ZipFile(from_path, 'r') as z:
-            z.extractall(to_path)
-    else:
-        raise ValueError(f'Extraction of {from_path} not supported')
+    writer = PipelinedWriter(queue_size)
+    try:
+        if from_path.endswith(('.tar', '.tar.gz', '.tgz', '.tar.xz')):
+            # stream mode decompresses sequentially and never seeks back into the archive
+            with tarfile.open(from_path, 'r|*') as tar:
+                for member in tar:
+                    member = _safe_member(member, to_path)
+                    if member is None:
+                        continue
+                    file_path = osp.join(to_path, member.name)
+                    if member.isdir():
+                        os.makedirs(file_path, exist_ok=True)
+                    elif member.isfile():
+                        writer.write(file_path, _read_chunks(tar.extractfile(member), chunk_size),
+                                     mtime=member.mtime, mode=member.mode & 0o777)
+                    else:
+                        # links and special files are rare and small. The target of a hard link must be on
+                        # disk, else tarfile would read it again from the archive, which a stream can not do
+                        writer.flush()
+                        tar.extract(member, to_path)
+        elif from_path.endswith('.gz'):
+            file_path = os.path.join(to_path, os.path.splitext(os.path.basename(from_path))[0])
+            with gzip.GzipFile(from_path) as zip_f:
+                writer.write(file_path, _read_chunks(zip_f, chunk_size))
+        elif from_path.endswith('.zip'):
+            with zipfile.ZipFile(from_path, 'r') as z:
+                for info in z.infolist():
+                    file_path = osp.join(to_path, info.filename)
+                    if not osp.realpath(file_path).startswith(osp.realpath(to_path) + os.sep):
+                        raise zipfile.BadZipFile(f'Member {info.filename} is outside of the extraction directory.')
+                    if info.is_dir():
+                        os.makedirs(file_path, exist_ok=True)
+                        continue
+                    with z.open(info) as f:
+                        writer.write(file_path, _read_chunks(f, chunk_size))
+        else:
+            raise ValueError(f'Extraction of {from_path} not supported')
+    except BaseException:
+        # the original error propagates, not one of the writer caused by it
+        writer.close(check=False)
+        raise
+    md5s = writer.close()
 
     if remove_finished:
         os.remove(from_path)
 
+    return md5s
+
 
 def download_and_extract_archive(url,
                                  download_root,
                                  extract_root=None,
                                  filename=None,
                                  md5=None,
-                                 remove_finished=False):
+                                 remove_finished=False,
+                                 verify='full'):
     """Download a file from a url and then extract compressed package file, place it in root.
     Args:
         url (str, required): URL to download file from.
@@ -167,6 +533,8 @@ def download_and_extract_archive(url,
                 If md5 is None, download without md5 check.
         remove_finished (bool, optional): Whether to delete the compressed package after decompression.
                 Default to False.
+        verify (str, optional): How to verify an existing download, see :func:`check_integrity`.
+                Default to 'full'.
     """
     download_root = os.path.expanduser(download_root)
     if extract_root is None:
@@ -174,7 +542,7 @@ def download_and_extract_archive(url,
     if not filename:
         filename = os.path.basename(url)
 
-    download_url(url, download_root, filename, md5)
+    download_url(url, download_root, filename, md5, verify=verify)
 
     archive = os.path.join(download_root, filename)
     print(f'Extracting {archive} to {extract_root}')
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from modules.datasets.utils import download_url_to_file
+
+CONTENT = os.urandom(256 * 1024 + 17)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve ``CONTENT`` with Range support, cutting the first ``cuts`` responses after half of the body."""
+
+    def __init__(self, *args, state, **kwargs):
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        header = self.headers.get('Range')
+        self.state['ranges'].append(header)
+        start = int(header[len('bytes='):-1]) if header and self.state['ranges_supported'] else 0
+        if start >= len(CONTENT):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(CONTENT)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = CONTENT[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.state['cuts'] > 0:
+            self.state['cuts'] -= 1
+            # the connection drops in the middle of the body
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    state = {'ranges': [], 'cuts': 0, 'ranges_supported': True}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), partial(RangeHandler, state=state))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/file.bin', state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_resume_after_dropped_connection(server, tmp_path):
+    url, state = server
+    state['cuts'] = 2
+    file_path = str(tmp_path / 'file.bin')
+    md5 = download_url_to_file(url, file_path, chunk_size=4096, retries=3)
+
+    assert read(file_path) == CONTENT
+    assert md5 == hashlib.md5(CONTENT).hexdigest()
+    assert not os.path.exists(f'{file_path}.part')
+    # every attempt resumes from the end of the partial file
+    half = len(CONTENT) // 2
+    assert state['ranges'] == [None, f'bytes={half}-', f'bytes={half + (len(CONTENT) - half) // 2}-']
+
+
+def test_resume_partial_file_of_previous_run(server, tmp_path):
+    url, state = server
+    file_path = str(tmp_path / 'file.bin')
+    with open(f'{file_path}.part', 'wb') as f:
+        f.write(CONTENT[:1000])
+    md5 = download_url_to_file(url, file_path)
+
+    assert read(file_path) == CONTENT and md5 == hashlib.md5(CONTENT).hexdigest()
+    assert state['ranges'] == ['bytes=1000-']
+
+
+def test_refetch_when_ranges_are_ignored(server, tmp_path):
+    url, state = server
+    state['ranges_supported'] = False
+    file_path = str(tmp_path / 'file.bin')
+    with open(f'{file_path}.part', 'wb') as f:
+        f.write(b'stale bytes')
+    md5 = download_url_to_file(url, file_path)
+
+    assert read(file_path) == CONTENT and md5 == hashlib.md5(CONTENT).hexdigest()
+
+
+def test_416_complete_partial_file(server, tmp_path):
+    url, state = server
+    file_path = str(tmp_path / 'file.bin')
+    with open(f'{file_path}.part', 'wb') as f:
+        f.write(CONTENT)
+    md5 = download_url_to_file(url, file_path)
+
+    assert read(file_path) == CONTENT and md5 == hashlib.md5(CONTENT).hexdigest()
+    assert state['ranges'] == [f'bytes={len(CONTENT)}-']
+
+
+def test_416_oversized_partial_file_is_refetched(server, tmp_path):
+    url, state = server
+    file_path = str(tmp_path / 'file.bin')
+    with open(f'{file_path}.part', 'wb') as f:
+        f.write(CONTENT + b'from an older version of the file')
+    md5 = download_url_to_file(url, file_path)
+
+    assert read(file_path) == CONTENT and md5 == hashlib.md5(CONTENT).hexdigest()
+    assert state['ranges'] == [f'bytes={len(CONTENT) + 33}-', None]
@@ -0,0 +1,78 @@
+import os
+import os.path as osp
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from modules.datasets import CustomDataset
+
+
+def identity_collate(batch):
+    return batch
+
+
+def make_folder(root, num_per_class=6):
+    rng = np.random.default_rng(0)
+    for cls in ['a', 'b']:
+        os.makedirs(osp.join(root, cls), exist_ok=True)
+        for i in range(num_per_class):
+            cv2.imwrite(osp.join(root, cls, f'{i}.png'), rng.integers(0, 256, (20, 24, 3), dtype=np.uint8))
+
+
+def build_dataset(root, **cache):
+    pipeline = dict(
+        type='Compose',
+        transforms=[
+            dict(type='LoadImageFromFile'),
+            dict(type='Resize', size=(16, 16)),
+            dict(type='ImageToTensor'),
+            dict(type='RandomFlip', flip_prob=0.)
+        ],
+        cache=dict(max_bytes=1 << 20, **cache))
+
+    return CustomDataset(data_path_prefix=root, pipeline=pipeline)
+
+
+def test_prefix_cache_shared_by_workers(tmp_path):
+    make_folder(str(tmp_path))
+    dataset = build_dataset(str(tmp_path))
+    cache = dataset.pipeline.cache
+    assert dataset.pipeline.num_deterministic == 3
+
+    for epoch in range(3):
+        loader = DataLoader(dataset, batch_size=2, shuffle=True, num_workers=3, collate_fn=identity_collate)
+        samples = [sample for batch in loader for sample in batch]
+        assert len(samples) == len(dataset)
+        counters = cache.counters()
+        # every sample is computed once on the node, whatever worker loads it in the next epochs
+        assert counters['misses'] == len(dataset)
+        assert counters['hits'] == epoch * len(dataset)
+
+
+def test_prefix_cache_hits_are_private(tmp_path):
+    make_folder(str(tmp_path))
+    dataset = build_dataset(str(tmp_path))
+    first = dataset[0]
+    reference = first['img'].clone()
+    first['img'].zero_()
+    first['img_info']['filename'] = 'changed'
+
+    second = dataset[0]
+    assert isinstance(second['img'], torch.Tensor)
+    assert torch.equal(second['img'], reference)
+    assert second['img_info']['filename'] != 'changed'
+
+
+def test_prefix_cache_spill_is_per_run(tmp_path):
+    make_folder(str(tmp_path / 'data'))
+    train = build_dataset(str(tmp_path / 'data'), spill_dir=str(tmp_path / 'spill'))
+    val = build_dataset(str(tmp_path / 'data'), spill_dir=str(tmp_path / 'spill'))
+    assert train.pipeline.cache.spill_dir != val.pipeline.cache.spill_dir
+
+    train[1]
+    # the memory of the node evicted the entry, it is read back from the spill directory
+    store = train.pipeline.cache.store
+    store.slots[1, 0] = -1
+    train[1]
+    assert train.pipeline.cache.spill_hits == 1
+    assert val.pipeline.cache.get(1) is None
@@ -0,0 +1,62 @@
+import glob
+import json
+import os.path as osp
+import socket
+import numpy as np
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from modules.datasets.shared_memory import share_arrays_on_node
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def share_on_rank(rank, world_size, port, out_dir):
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+    calls = []
+
+    def load_fn():
+        calls.append(rank)
+        return {'labels': np.arange(10, dtype=np.int64), 'imgs': np.ones((4, 3, 3), dtype=np.uint8)}, {'n': 10}
+
+    arrays, meta = share_arrays_on_node('test', load_fn)
+    segments = sorted(osp.basename(path) for path in glob.glob('/dev/shm/qcls_*'))
+    names = [None] * world_size
+    dist.all_gather_object(names, {name: array._shm_name for name, array in arrays.items()})
+    with open(osp.join(out_dir, f'{rank}.json'), 'w') as f:
+        json.dump({
+            'calls': calls,
+            'meta': meta,
+            'names': names,
+            'segments': segments,
+            'writeable': [bool(array.flags.writeable) for array in arrays.values()],
+            'labels': arrays['labels'].tolist(),
+            'imgs_sum': int(arrays['imgs'].sum())
+        }, f)
+    # the creator must outlive the readers of the segments
+    dist.barrier()
+    dist.destroy_process_group()
+
+
+def test_share_arrays_on_node_gloo(tmp_path):
+    before = set(glob.glob('/dev/shm/qcls_*'))
+    mp.spawn(share_on_rank, args=(2, free_port(), str(tmp_path)), nprocs=2)
+    results = []
+    for rank in range(2):
+        with open(tmp_path / f'{rank}.json') as f:
+            results.append(json.load(f))
+
+    # only the local rank 0 loads the data, the other rank attaches to the same segments
+    assert results[0]['calls'] == [0] and results[1]['calls'] == []
+    assert results[0]['names'][0] == results[0]['names'][1]
+    new_segments = set(results[1]['segments']) - {osp.basename(path) for path in before}
+    assert len(new_segments) == 3  # two arrays and the header
+    for result in results:
+        assert result['meta'] == {'n': 10}
+        assert result['labels'] == list(range(10)) and result['imgs_sum'] == 36
+        assert not any(result['writeable'])
+    # the creator unlinks the segments when it exits
+    assert set(glob.glob('/dev/shm/qcls_*')) == before
@@ -0,0 +1,46 @@
+import warnings
+import numpy as np
+import pytest
+from modules.datasets import BaseDataset, SampleTable
+from modules.datasets.index_cache import dump_arrays, load_arrays
+
+PIPELINE = [dict(type='ImageToTensor'), dict(type='ToTensor', keys=['gt_label'])]
+
+
+class InMemoryDataset(BaseDataset):
+    CLASSES = ['a', 'b']
+
+    def __init__(self, table, pipeline):
+        self.table = table
+        super(InMemoryDataset, self).__init__('', pipeline)
+
+    def load_annotations(self):
+        return self.table
+
+
+def make_table(tmp_path, mmap):
+    imgs = np.arange(4 * 5 * 6 * 3, dtype=np.uint8).reshape(4, 5, 6, 3)
+    gt_labels = np.arange(4, dtype=np.int64) % 2
+    if not mmap:
+        return SampleTable(gt_labels, imgs=imgs)
+    dump_arrays(str(tmp_path / 'table.idx'), SampleTable(gt_labels, imgs=imgs).to_arrays())
+    arrays, _ = load_arrays(str(tmp_path / 'table.idx'))
+
+    return SampleTable.from_arrays(arrays)
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_tensors_do_not_alias_data_infos(tmp_path, mmap):
+    dataset = InMemoryDataset(make_table(tmp_path, mmap), PIPELINE)
+    reference = np.array(dataset.data_infos.imgs)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        sample = dataset[1]
+    sample['img'].zero_()
+    sample['gt_label'].fill_(7)
+
+    assert tuple(sample['img'].shape) == (3, 5, 6)
+    np.testing.assert_array_equal(dataset.data_infos.imgs, reference)
+    assert dataset.data_infos.gt_labels[1] == 1
+    assert int(dataset[1]['img'].sum()) == int(reference[1].sum())
@@ -0,0 +1,92 @@
+import argparse
+import os.path as osp
+import random
+import time
+import mmcv
+import numpy as np
+from modules.datasets.ann_parser import parse_ann_file
+from modules.utlis import get_root_logger
+
+
+def config_parse():
+    """Input config from cmd line.
+
+    Return:
+        :obj: 'parses.parse_args()': The dict of namespace for config.
+    """
+    parses = argparse.ArgumentParser("benchmark annotation parser")
+    parses.add_argument("--ann_file", type=str, help="Annotation file to parse, generated if it does not exist")
+    parses.add_argument("--num_lines", type=int, default=2000000, help="Number of lines of a generated file")
+    parses.add_argument("--num_workers", type=int, default=8, help="Number of processes of the new parser")
+    parses.add_argument("--repeat", type=int, default=3, help="Number of timed runs of each parser")
+    configs = parses.parse_args()
+    return configs
+
+
+def generate_ann_file(file_path, num_lines):
+    """Write a synthetic annotation file.
+    Args:
+        file_path (str, required): Path of output txt file.
+        num_lines (int, required): Number of samples.
+    """
+    rng = random.Random(2023)
+    with open(file_path, "w", encoding='utf-8') as f:
+        for i in range(num_lines):
+            label = rng.randint(0, 999)
+            f.write(f"class_{label}/sub_{rng.randint(0, 99)}/image_{i:09d}.jpg {label}\n")
+
+
+def legacy_parser(ann_file):
+    """Parse the annotation file like ``CustomDataset`` did before the vectorized parser.
+    Args:
+        ann_file (str, required): Path of the annotation file.
+    Return:
+        :list[dict]: Information of every sample.
+    """
+    lines = mmcv.list_from_file(ann_file)
+    samples = [x.strip().rsplit(' ', 1) for x in lines]
+    return [{'img_prefix': '', 'img_info': {'filename': filename}, 'gt_label': np.array(gt_label, dtype=np.int64)}
+            for filename, gt_label in samples]
+
+
+def timeit(func, repeat):
+    """Run a function several times.
+    Args:
+        func (callable, required): Function to be timed.
+        repeat (int, required): Number of runs.
+    Return:
+        :tuple[float, obj]: The best time in seconds and the result of the last run.
+    """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - tic)
+    return best, result
+
+
+def main():
+    if not osp.exists(args.ann_file):
+        logger.info(f'generating {args.num_lines} lines into {args.ann_file}')
+        generate_ann_file(args.ann_file, args.num_lines)
+
+    legacy_time, infos = timeit(lambda: legacy_parser(args.ann_file), args.repeat)
+    serial_time, _ = timeit(lambda: parse_ann_file(args.ann_file, num_workers=1), args.repeat)
+    parallel_time, (filenames, gt_labels) = timeit(
+        lambda: parse_ann_file(args.ann_file, num_workers=args.num_workers, parallel_threshold=0), args.repeat)
+
+    assert len(infos) == len(filenames) and all(
+        infos[i]['img_info']['filename'] == filenames[i] and infos[i]['gt_label'] == gt_labels[i]
+        for i in range(0, len(infos), max(1, len(infos) // 1000)))
+
+    logger.info(f'{len(infos)} lines, size {osp.getsize(args.ann_file) / 2 ** 20:.1f}MB')
+    logger.info(f'legacy parser: {legacy_time:.2f}s')
+    logger.info(f'vectorized parser, 1 process: {serial_time:.2f}s ({legacy_time / serial_time:.1f}x)')
+    logger.info(f'vectorized parser, {args.num_workers} processes: {parallel_time:.2f}s '
+                f'({legacy_time / parallel_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    args = config_parse()
+    logger = get_root_logger()
+    main()
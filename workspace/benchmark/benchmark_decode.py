@@ -0,0 +1,73 @@
+import argparse
+import glob
+import os
+import os.path as osp
+import time
+import cv2
+import numpy as np
+from modules.datasets.pipelines import Compose, Results
+from modules.utlis import get_root_logger
+
+
+def config_parse():
+    """Input config from cmd line.
+
+    Return:
+        :obj: 'parses.parse_args()': The dict of namespace for config.
+    """
+    parses = argparse.ArgumentParser("benchmark reduced image decoding")
+    parses.add_argument("--img_dir", type=str, help="Directory of JPEG images, generated if it does not exist")
+    parses.add_argument("--num_images", type=int, default=8, help="Number of generated images")
+    parses.add_argument("--target_size", type=int, default=224, help="Short side of the resized images")
+    parses.add_argument("--repeat", type=int, default=3, help="Number of timed runs of each pipeline")
+    configs = parses.parse_args()
+    return configs
+
+
+def generate_images(img_dir, num_images):
+    """Write synthetic 12MP JPEG images.
+    Args:
+        img_dir (str, required): Output directory.
+        num_images (int, required): Number of images.
+    """
+    os.makedirs(img_dir, exist_ok=True)
+    rng = np.random.default_rng(2023)
+    for i in range(num_images):
+        # upsampled noise, closer to the entropy of a photo than plain noise
+        img = cv2.resize(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8), (4000, 3000),
+                         interpolation=cv2.INTER_CUBIC)
+        cv2.imwrite(osp.join(img_dir, f'image_{i:04d}.jpg'), img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+def main():
+    filenames = sorted(glob.glob(osp.join(args.img_dir, '*.jpg')))
+    if not filenames:
+        logger.info(f'generating {args.num_images} images into {args.img_dir}')
+        generate_images(args.img_dir, args.num_images)
+        filenames = sorted(glob.glob(osp.join(args.img_dir, '*.jpg')))
+
+    resize = dict(type='Resize', size=(args.target_size, -1))
+    for backend in ['cv2', 'pillow']:
+        full = Compose([dict(type='LoadImageFromFile', backend=backend), resize])
+        reduced = Compose([dict(type='LoadImageFromFile', target_size=(args.target_size, -1), backend=backend), resize])
+        times, decoded_bytes = {}, {}
+        for name, pipeline in [('full', full), ('reduced', reduced)]:
+            best = float('inf')
+            for _ in range(args.repeat):
+                tic = time.perf_counter()
+                for filename in filenames:
+                    results = pipeline.transforms[0](Results(img_prefix=None, img_info={'filename': filename}))
+                    decoded_bytes[name] = results['img'].nbytes
+                    pipeline.transforms[1](results)
+                best = min(best, time.perf_counter() - tic)
+            times[name] = best / len(filenames)
+        logger.info(f'{backend}: full decode + resize {times["full"] * 1e3:.1f}ms '
+                    f'({decoded_bytes["full"] / 2 ** 20:.1f}MB decoded), reduced decode + resize '
+                    f'{times["reduced"] * 1e3:.1f}ms ({decoded_bytes["reduced"] / 2 ** 20:.2f}MB decoded), '
+                    f'{times["full"] / times["reduced"]:.1f}x')
+
+
+if __name__ == '__main__':
+    args = config_parse()
+    logger = get_root_logger()
+    main()
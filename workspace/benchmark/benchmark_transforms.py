@@ -0,0 +1,104 @@
+import argparse
+import time
+import numpy as np
+import torch
+from modules.datasets.pipelines import Compose, Results
+from modules.utlis import get_root_logger
+
+
+def config_parse():
+    """Input config from cmd line.
+
+    Return:
+        :obj: 'parses.parse_args()': The dict of namespace for config.
+    """
+    parses = argparse.ArgumentParser("benchmark batch transforms")
+    parses.add_argument("--batch_size", type=int, default=128, help="Number of images of a batch")
+    parses.add_argument("--height", type=int, default=256, help="Height of the synthetic images")
+    parses.add_argument("--width", type=int, default=256, help="Width of the synthetic images")
+    parses.add_argument("--repeat", type=int, default=5, help="Number of timed runs of each mode")
+    configs = parses.parse_args()
+    return configs
+
+
+def build_pipelines():
+    """Build the transforms to be timed, one by one and chained.
+
+    Return:
+        :list[tuple[str, list[dict]]]: Name and transform configs of every pipeline.
+    """
+    resize = dict(type='Resize', size=(224, -1))
+    center_crop = dict(type='CenterCrop', crop_size=224)
+    random_crop = dict(type='RandomCrop', size=224)
+    flip = dict(type='RandomFlip', flip_prob=0.5)
+    normalize = dict(type='Normalize', mean=[123.675, 116.28, 103.53], std=[58.395, 57.12, 57.375], to_rgb=True)
+    to_tensor = dict(type='ImageToTensor', keys=['img'])
+    return [
+        ('Resize', [resize]),
+        ('CenterCrop', [center_crop]),
+        ('RandomCrop', [random_crop]),
+        ('RandomFlip', [flip]),
+        ('Normalize', [normalize]),
+        ('ImageToTensor', [to_tensor]),
+        ('train pipeline', [random_crop, flip, normalize, to_tensor]),
+        ('test pipeline', [resize, center_crop, normalize, to_tensor]),
+    ]
+
+
+def stack(imgs):
+    """Stack images into one contiguous batch like the collate function does, so lazily cropped or flipped
+    views are paid for in both modes.
+    Args:
+        imgs (list[np.ndarray | torch.Tensor] | np.ndarray | torch.Tensor, required): Images or a stacked block.
+    Return:
+        :np.ndarray | torch.Tensor: The contiguous batch.
+    """
+    if isinstance(imgs, list):
+        return torch.stack(imgs) if isinstance(imgs[0], torch.Tensor) else np.stack(imgs)
+    return imgs.contiguous() if isinstance(imgs, torch.Tensor) else np.ascontiguousarray(imgs)
+
+
+def timeit(func, repeat):
+    """Run a function several times.
+    Args:
+        func (callable, required): Function to be timed.
+        repeat (int, required): Number of runs.
+    Return:
+        :float: The best time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(2023)
+    imgs = rng.integers(0, 256, size=(args.batch_size, args.height, args.width, 3), dtype=np.uint8)
+    imgs.flags.writeable = False
+    logger.info(f'{args.batch_size} images of {args.height}x{args.width}x3')
+
+    for name, transforms in build_pipelines():
+        pipeline = Compose(transforms)
+
+        def per_sample():
+            # like ``prepare_data``, one container per sample sharing the read-only image
+            return stack([pipeline(Results(img=img))['img'] for img in imgs])
+
+        def batch():
+            results = Results()
+            results['img'] = imgs
+            return stack(pipeline.batch(results)['img'])
+
+        sample_time = timeit(per_sample, args.repeat)
+        batch_time = timeit(batch, args.repeat)
+        logger.info(f'{name}: per-sample {args.batch_size / sample_time:.0f} img/s, '
+                    f'batch {args.batch_size / batch_time:.0f} img/s ({sample_time / batch_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    args = config_parse()
+    logger = get_root_logger()
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import time
+import mmcv
+from modules.datasets import pack_dataset
+from modules.utlis import get_root_logger
+
+
+def config_parse():
+    """Input config from cmd line.
+    Return:
+        :obj: 'parses.parse_args()': The dict of namespace for config.
+    """
+    parses = argparse.ArgumentParser("pack dataset into shards")
+    parses.add_argument("--config", type=str, help="Config file holding the dataset to pack")
+    parses.add_argument("--key", type=str, default="data.train", help="Dotted key of the dataset in the config")
+    parses.add_argument("--output_root", type=str, help="Directory of the shards and of the index")
+    parses.add_argument("--shard_size", type=int, default=1024, help="Size of a shard in MB")
+    parses.add_argument("--num_thread", type=int, default=8, help="Set the number of multi-threaded threads")
+    configs = parses.parse_args()
+    return configs
+
+
+def main():
+    cfg = mmcv.Config.fromfile(args.config)
+    dataset_cfg = cfg
+    for key in args.key.split('.'):
+        dataset_cfg = dataset_cfg[key]
+
+    index_file = pack_dataset(
+        dict(dataset_cfg),
+        args.output_root,
+        shard_size=args.shard_size * 1024 * 1024,
+        num_threads=args.num_thread
+    )
+    logger.info(f'index of the packed dataset: {index_file}')
+
+
+if __name__ == '__main__':
+    tic = time.time()
+    args = config_parse()
+    logger = get_root_logger()
+
+    main()
+
+    elapsed = time.time() - tic
+    print(f'time cost: {elapsed // 60} minutes.')